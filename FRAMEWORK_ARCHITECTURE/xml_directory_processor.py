@@ -6,23 +6,69 @@ Key improvements:
 3. Execution context hints
 4. Dependency detection
 5. Project structure inference
+6. Optional import graph resolved to in-repo files (--dependency-graph)
+7. Oversized files compressed to a symbol outline or head/tail excerpt (--outline-oversized)
+8. Well-formed XML output with CDATA content (--strict-xml), restorable with --restore
 """
 
 import os
 import sys
+import ast
+import posixpath
+import sqlite3
+import mmap
+import codecs
 import argparse
 import re
 import tiktoken
 import json
 import logging
 import hashlib
+import shutil
+import tempfile
+import time
+import subprocess
+import base64
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 from tqdm import tqdm
 from pathlib import Path
 from typing import List, Dict, Tuple, Set, Optional
 import nbconvert
+import nbformat
 import fnmatch
+import heapq
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 
 DEFAULT_OUTPUT_FILE = "codebase_structured.txt"
+DEFAULT_NOTEBOOK_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "directory-processor", "notebooks")
+DEFAULT_NOTEBOOK_MAX_OUTPUT_CHARS = 2000
+DEFAULT_IMPORT_CACHE = os.path.join(os.path.dirname(DEFAULT_NOTEBOOK_CACHE_DIR), "imports.sqlite")
+IMPORT_PARSER_VERSION = 1
+IMPORT_PARSE_BATCH = 64
+IMPORT_LANGUAGES = {".py": "python", ".js": "js", ".jsx": "js", ".mjs": "js", ".cjs": "js",
+                    ".ts": "js", ".tsx": "js", ".go": "go"}
+JS_RESOLVE_SUFFIXES = ["", ".js", ".ts", ".jsx", ".tsx", ".mjs", ".cjs", ".json",
+                       "/index.js", "/index.ts", "/index.jsx", "/index.tsx"]
+SNIFF_BYTES = 8192
+MMAP_MIN_SIZE = 1024 * 1024
+# Token-budget packing: value added per signal on top of 1 per file (coverage)
+PACK_WEIGHTS = {"entry_point": 8.0, "manifest": 5.0, "entry_dependency": 4.0, "small_config": 3.0, "recent": 2.0}
+ORDER_MODES = ["walk", "dependency"]
+DEFAULT_OUTLINE_TOKENS = 1000
+OUTLINE_CONSTANT_CHARS = 120
+XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+# Characters XML 1.0 cannot carry, plus \r which parsers normalize away; content with any is base64-encoded
+XML_UNSAFE_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\r\ud800-\udfff\ufffe\uffff]")
+COUNT_CHUNK_CHARS = 1024 * 1024
+CONFIG_EXTENSIONS = {".json", ".yaml", ".yml", ".toml", ".ini", ".cfg"}
+SMALL_CONFIG_TOKENS = 2000
+FILE_ENTRY_OVERHEAD_TOKENS = 20  # <file> tags, attributes and code fences
+PLAN_TOKENIZE_BATCH = 64
+GIT_VISIBLE_FILES_ARGS = ["ls-files", "--cached", "--others", "--exclude-standard", "-z"]
 list_dir_ignored = []
 
 def setup_logging(log_file: str, enable_logging: bool = True):
@@ -36,25 +82,59 @@ def setup_logging(log_file: str, enable_logging: bool = True):
     else:
         logging.basicConfig(level=logging.ERROR, handlers=[logging.NullHandler()])
 
-def count_tokens(text: str) -> int:
-    encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text))
-
-def detect_project_type(root_path: str) -> Dict[str, any]:
-    """Detect project type and key files for LLM context"""
-    project_info = {
-        "type": "unknown",
-        "language": "mixed",
-        "framework": None,
-        "entry_points": [],
-        "config_files": [],
-        "dependency_files": [],
-        "test_directories": [],
-        "build_files": []
-    }
+DEFAULT_ENCODING = "cl100k_base"
+
+@lru_cache(maxsize=None)
+def get_encoder(model: Optional[str] = None) -> "tiktoken.Encoding":
+    """Cached tiktoken encoder for a model or encoding name (cl100k_base by default)"""
+    if model is None:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(model)
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    return len(get_encoder(model).encode_ordinary(text))
+
+def count_tokens_batch(texts: List[str], model: Optional[str] = None, num_threads: int = 8) -> List[int]:
+    """Token counts for many texts, encoded in parallel native threads"""
+    encoded = get_encoder(model).encode_ordinary_batch(texts, num_threads=num_threads)
+    return [len(tokens) for tokens in encoded]
+
+class BinaryFileError(ValueError):
+    """A file whose first few KB contain NUL bytes or invalid UTF-8"""
+
+def looks_binary(head: bytes) -> bool:
+    if b"\0" in head:
+        return True
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)  # tolerate a cut-off last character
+    except UnicodeDecodeError:
+        return True
+    return False
+
+def read_text_file(path: str) -> str:
+    """Read UTF-8 text with text-mode newlines; binaries are rejected from their first KB, large files decoded from a memory map"""
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+        if looks_binary(head):
+            raise BinaryFileError(f"Binary file: {path}")
+        
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+            content = (head + f.read()).decode("utf-8")
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                content = str(mapped, "utf-8")  # the only full copy
     
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content
+
+class ProjectDetector:
+    """Detect project type and key files for LLM context, as a visitor of the main directory walk"""
     # Check for key indicator files
-    key_files = {
+    KEY_FILES = {
         "package.json": {"type": "nodejs", "language": "javascript"},
         "requirements.txt": {"type": "python", "language": "python"},
         "pyproject.toml": {"type": "python", "language": "python"},
@@ -66,35 +146,44 @@ def detect_project_type(root_path: str) -> Dict[str, any]:
         "composer.json": {"type": "php", "language": "php"},
         "Gemfile": {"type": "ruby", "language": "ruby"}
     }
+    CONFIG_FILES = {"config.json", "settings.py", ".env.example", "docker-compose.yml", "Dockerfile"}
+    ENTRY_POINTS = {"main.py", "app.py", "index.js", "server.js", "main.go", "main.rs"}
+    BUILD_FILES = {"Makefile", "build.sh", "webpack.config.js", "vite.config.js"}
+    TEST_DIRS = {"test", "tests", "__tests__", "spec"}
+    MAX_DEPTH = 2
     
-    for root, dirs, files in os.walk(root_path):
-        if root.count(os.sep) - root_path.count(os.sep) > 2:  # Limit depth
-            continue
-            
+    def __init__(self, root_path: str):
+        self.root_depth = root_path.count(os.sep)
+        self.project_info = {
+            "type": "unknown",
+            "language": "mixed",
+            "framework": None,
+            "entry_points": [],
+            "config_files": [],
+            "dependency_files": [],
+            "test_directories": [],
+            "build_files": []
+        }
+    
+    def visit(self, root: str, dirs: List[str], files: List[str]) -> None:
+        """Called for each directory the walk enters, before its subdirectories are pruned"""
+        if root.count(os.sep) - self.root_depth > self.MAX_DEPTH:  # Limit depth
+            return
+        project_info = self.project_info
         for file in files:
-            if file in key_files:
-                info = key_files[file]
-                project_info.update(info)
+            if file in self.KEY_FILES:
+                project_info.update(self.KEY_FILES[file])
                 project_info["dependency_files"].append(os.path.join(root, file))
-            
-            # Config files
-            if file in ["config.json", "settings.py", ".env.example", "docker-compose.yml", "Dockerfile"]:
+            if file in self.CONFIG_FILES:
                 project_info["config_files"].append(os.path.join(root, file))
-            
-            # Entry points
-            if file in ["main.py", "app.py", "index.js", "server.js", "main.go", "main.rs"]:
+            if file in self.ENTRY_POINTS:
                 project_info["entry_points"].append(os.path.join(root, file))
-            
-            # Build files
-            if file in ["Makefile", "build.sh", "webpack.config.js", "vite.config.js"]:
+            if file in self.BUILD_FILES:
                 project_info["build_files"].append(os.path.join(root, file))
         
-        # Test directories
         for dir_name in dirs:
-            if dir_name in ["test", "tests", "__tests__", "spec"]:
+            if dir_name in self.TEST_DIRS:
                 project_info["test_directories"].append(os.path.join(root, dir_name))
-    
-    return project_info
 
 def get_file_metadata(file_path: str) -> Dict[str, any]:
     """Extract metadata useful for recreation"""
@@ -153,6 +242,326 @@ def extract_imports_dependencies(content: str, file_path: str) -> List[str]:
     
     return imports
 
+JS_TOKEN_RE = re.compile(r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:\\.|[^'\\\n])*'|"(?:\\.|[^"\\\n])*"|`(?:\\.|[^`\\])*`)
+  | (?P<word>[A-Za-z_$][\w$]*)
+  | (?P<punct>[().;{}])
+""", re.S | re.X)
+
+def code_tokens(content: str) -> List[Tuple[str, str]]:
+    """(kind, text) tokens for JS/Go with comments dropped, so commented-out imports and strings don't count"""
+    return [(m.lastgroup, m.group()) for m in JS_TOKEN_RE.finditer(content) if m.lastgroup != "comment"]
+
+def parse_js_imports(content: str) -> List[str]:
+    """import/export ... from 'x', import 'x', import('x') and require('x') specifiers"""
+    tokens = code_tokens(content)
+    specs = []
+    for i, (kind, text) in enumerate(tokens):
+        if kind != "word" or text not in ("from", "import", "require"):
+            continue
+        following = tokens[i + 1:i + 4]
+        if following and following[0][0] == "string" and text != "require":
+            specs.append(following[0][1][1:-1])
+        elif len(following) >= 2 and following[0][1] == "(" and following[1][0] == "string" and text != "from":
+            specs.append(following[1][1][1:-1])
+    return specs
+
+def parse_go_imports(content: str) -> List[str]:
+    """Paths from single and grouped import declarations, aliases allowed"""
+    tokens = code_tokens(content)
+    specs = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == ("word", "import"):
+            i += 1
+            grouped = i < len(tokens) and tokens[i][1] == "("
+            while i < len(tokens) and tokens[i][1] != ")":
+                if tokens[i][0] == "string":
+                    specs.append(tokens[i][1][1:-1])
+                    if not grouped:
+                        break
+                i += 1
+        i += 1
+    return specs
+
+def parse_python_imports(content: str) -> List[List]:
+    """[module, [imported names]] per import; relative modules keep their leading dots"""
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return [[module, []] for module in extract_imports_dependencies(content, "fallback.py")]
+    specs = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            specs.extend([alias.name, []] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            names = [alias.name for alias in node.names if alias.name != "*"]
+            specs.append(["." * node.level + (node.module or ""), names])
+    return specs
+
+def parse_imports_batch(batch: List[Tuple[str, str, str, str]]) -> List[Tuple[str, str, List]]:
+    """Parse (rel_path, key, language, content) items; runs in a worker process"""
+    parsers = {"python": parse_python_imports, "js": parse_js_imports, "go": parse_go_imports}
+    results = []
+    for rel_path, key, language, content in batch:
+        try:
+            specs = parsers[language](content)
+        except Exception:
+            specs = []
+        results.append((rel_path, key, [spec if isinstance(spec, list) else [spec, []] for spec in specs]))
+    return results
+
+class ImportGraph:
+    """Import graph of the dumped files, resolved to in-repo paths.
+    
+    Raw imports depend only on a file's content, so they are cached in SQLite by content hash and
+    only misses are parsed, in batches spread over a process pool. Resolution against the set of
+    dumped files happens once the walk is complete.
+    """
+    def __init__(self, root_path: str, cache_path: str):
+        self.root_path = root_path
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self.cache = sqlite3.connect(cache_path)
+        self.cache.execute("CREATE TABLE IF NOT EXISTS imports (key TEXT PRIMARY KEY, specs TEXT NOT NULL)")
+        self.paths = set()
+        self.specs = {}
+        self.order = []
+        self.batch = []
+        self.futures = []
+        self.executor = None
+        self.resolved = None
+        self.hits = 0
+        self.misses = 0
+    
+    def add(self, rel_path: str, content: str) -> None:
+        rel_path = rel_path.replace(os.sep, "/")
+        if rel_path in self.paths:
+            return  # already seen while planning the output order
+        self.paths.add(rel_path)
+        language = IMPORT_LANGUAGES.get(os.path.splitext(rel_path)[1].lower())
+        if language is None:
+            return
+        self.order.append(rel_path)
+        key = hashlib.sha256(f"{IMPORT_PARSER_VERSION}:{language}\0{content}".encode("utf-8")).hexdigest()
+        row = self.cache.execute("SELECT specs FROM imports WHERE key = ?", (key,)).fetchone()
+        if row:
+            self.hits += 1
+            self.specs[rel_path] = json.loads(row[0])
+            return
+        self.misses += 1
+        self.batch.append((rel_path, key, language, content))
+        if len(self.batch) >= IMPORT_PARSE_BATCH:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor()
+            self.futures.append(self.executor.submit(parse_imports_batch, self.batch))
+            self.batch = []
+    
+    def collect(self) -> None:
+        """Wait for outstanding parses and store them in the cache"""
+        results = parse_imports_batch(self.batch) if self.batch else []  # small remainder parses inline
+        self.batch = []
+        for future in self.futures:
+            results.extend(future.result())
+        self.futures = []
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        for rel_path, key, specs in results:
+            self.specs[rel_path] = specs
+            self.cache.execute("INSERT OR REPLACE INTO imports VALUES (?, ?)", (key, json.dumps(specs)))
+        self.cache.commit()
+        logging.info(f"Import cache: {self.hits} hits, {self.misses} parsed")
+    
+    def python_module(self, path: str) -> Optional[str]:
+        path = posixpath.normpath(path)
+        for candidate in (f"{path}.py", f"{path}/__init__.py"):
+            if candidate in self.paths:
+                return candidate
+        return None
+    
+    def resolve_python(self, rel_path: str, module: str, names: List[str]) -> Tuple[List[str], Optional[str]]:
+        level = len(module) - len(module.lstrip("."))
+        module = module[level:]
+        if level:
+            base = posixpath.dirname(rel_path)
+            for _ in range(level - 1):
+                base = posixpath.dirname(base)
+            roots = [base]
+        else:
+            # Script directory, repo root and a src/ layout, as sys.path usually has them
+            roots = [posixpath.dirname(rel_path), "", "src"]
+        for root in roots:
+            module_path = posixpath.join(root, *module.split(".")) if module else root
+            targets = [t for t in (self.python_module(posixpath.join(module_path, n)) for n in names) if t]
+            if not targets and module:
+                target = self.python_module(module_path)
+                targets = [target] if target else []
+            if targets:
+                return targets, None
+        return [], (module.split(".")[0] if module and not level else None)
+    
+    def resolve_js(self, rel_path: str, spec: str) -> Tuple[List[str], Optional[str]]:
+        if not spec.startswith("."):
+            parts = spec.split("/")
+            return [], "/".join(parts[:2]) if spec.startswith("@") else parts[0]
+        base = posixpath.normpath(posixpath.join(posixpath.dirname(rel_path), spec))
+        for suffix in JS_RESOLVE_SUFFIXES:
+            if base + suffix in self.paths:
+                return [base + suffix], None
+        return [], None
+    
+    def resolve_go(self, spec: str, go_module: Optional[str], go_packages: Dict[str, List[str]]) -> Tuple[List[str], Optional[str]]:
+        if go_module and (spec == go_module or spec.startswith(go_module + "/")):
+            return go_packages.get(spec[len(go_module) + 1:], []), None
+        return [], spec
+    
+    def go_layout(self) -> Tuple[Optional[str], Dict[str, List[str]]]:
+        go_module = None
+        try:
+            with open(os.path.join(self.root_path, "go.mod"), "r", encoding="utf-8") as f:
+                match = re.search(r"^module\s+(\S+)", f.read(), re.MULTILINE)
+                go_module = match.group(1) if match else None
+        except OSError:
+            pass
+        go_packages = {}
+        for path in sorted(self.paths):
+            if path.endswith(".go") and not path.endswith("_test.go"):
+                go_packages.setdefault(posixpath.dirname(path), []).append(path)
+        return go_module, go_packages
+    
+    def resolve(self) -> Dict[str, Tuple[List[str], List[str]]]:
+        """rel_path -> (in-repo files it imports, external packages), for files that import anything"""
+        if self.resolved is not None:
+            return self.resolved
+        self.collect()
+        go_module, go_packages = self.go_layout()
+        graph = {}
+        for rel_path in self.order:
+            language = IMPORT_LANGUAGES[os.path.splitext(rel_path)[1].lower()]
+            internal, external = [], []
+            for spec, names in self.specs.get(rel_path, []):
+                if language == "python":
+                    targets, package = self.resolve_python(rel_path, spec, names)
+                elif language == "js":
+                    targets, package = self.resolve_js(rel_path, spec)
+                else:
+                    targets, package = self.resolve_go(spec, go_module, go_packages)
+                internal.extend(t for t in targets if t != rel_path and t not in internal)
+                if package and package not in external:
+                    external.append(package)
+            if internal or external:
+                graph[rel_path] = (internal, external)
+        self.resolved = graph
+        return graph
+    
+    def write(self, out: "XmlEmitter") -> None:
+        graph = self.resolve()
+        edges = sum(len(internal) for internal, _ in graph.values())
+        out.start("dependency_graph", {"files": len(graph), "edges": edges})
+        for rel_path, (internal, external) in graph.items():
+            out.element("module", {"path": rel_path, "imports": ",".join(internal) or None,
+                                   "external": ",".join(external) or None}, indent="  ")
+        out.end("dependency_graph", "\n\n")
+    
+    def close(self) -> None:
+        self.collect()
+        self.cache.close()
+
+def first_line(text: str) -> str:
+    return text.strip().splitlines()[0] if text.strip() else ""
+
+def symbol_outline(node, depth: int) -> List[str]:
+    """Decorators, signature and first docstring line of a class or function, methods nested"""
+    indent = "    " * depth
+    lines = [f"{indent}@{ast.unparse(decorator)}" for decorator in node.decorator_list]
+    if isinstance(node, ast.ClassDef):
+        bases = ", ".join(ast.unparse(b) for b in node.bases + node.keywords)
+        lines.append(f"{indent}class {node.name}{f'({bases})' if bases else ''}:  # line {node.lineno}")
+    else:
+        prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+        returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+        lines.append(f"{indent}{prefix} {node.name}({ast.unparse(node.args)}){returns}:  # line {node.lineno}")
+    
+    docstring = ast.get_docstring(node)
+    if docstring:
+        lines.append(f'{indent}    """{first_line(docstring)}"""')
+    members = [child for child in node.body if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
+    if isinstance(node, ast.ClassDef) and members:
+        for child in members:
+            lines.extend(symbol_outline(child, depth + 1))
+    else:
+        lines.append(f"{indent}    ...")
+    return lines
+
+def python_outline(content: str) -> List[str]:
+    """Module docstring, UPPER_CASE constants and class/function signatures of Python source"""
+    tree = ast.parse(content)
+    lines = []
+    docstring = ast.get_docstring(tree)
+    if docstring:
+        lines.append(f'"""{first_line(docstring)}"""')
+    for node in tree.body:
+        if isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names = [t.id for t in targets if isinstance(t, ast.Name)]
+            if names and all(name.isupper() for name in names):
+                source = ast.unparse(node)
+                if len(source) > OUTLINE_CONSTANT_CHARS:
+                    source = source[:OUTLINE_CONSTANT_CHARS] + " ..."
+                lines.append(source)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            lines.extend(symbol_outline(node, 0))
+    return lines
+
+def take_lines(lines, max_tokens: int, model: Optional[str]) -> List[str]:
+    """Leading lines of an iterable that fit in max_tokens"""
+    taken, used = [], 0
+    for line in lines:
+        tokens = count_tokens(line, model)
+        if used + tokens > max_tokens:
+            break
+        taken.append(line)
+        used += tokens
+    return taken
+
+def needs_excerpt(tokens: int, params: Dict) -> bool:
+    """Over --token-limit with --outline-oversized, and bigger than an excerpt may be; a file that
+    already fits in --outline-tokens is written in full, since no excerpt of it could be smaller"""
+    return params["outline_oversized"] and tokens > params["token_limit"] and tokens > params["outline_tokens"]
+
+def make_excerpt(content: str, file_path: str, params: Dict) -> Tuple[str, str, int]:
+    """Compressed stand-in for an oversized file as (kind, text, tokens).
+    
+    Python gets a symbol outline, anything else (or unparsable Python) the first and last lines,
+    each capped at --outline-tokens.
+    """
+    budget = params["outline_tokens"]
+    model = params["model"]
+    if file_path.endswith(".py"):
+        try:
+            outline = [line + "\n" for line in python_outline(content)]
+        except (SyntaxError, ValueError):
+            outline = None
+        if outline is not None:
+            marker = f"# ... {len(outline)} more outline lines\n"
+            kept = take_lines(outline, budget, model)
+            if len(kept) < len(outline):
+                kept = take_lines(outline, budget - count_tokens(marker, model), model)
+                kept.append(f"# ... {len(outline) - len(kept)} more outline lines\n")
+            excerpt = "".join(kept)
+            return "outline", excerpt, count_tokens(excerpt, model)
+    
+    lines = content.splitlines(keepends=True)
+    half = (budget - count_tokens(f"... [{len(lines)} lines omitted] ...\n", model)) // 2
+    head = take_lines(lines, half, model)
+    tail = take_lines(reversed(lines[len(head):]), half, model)[::-1]
+    excerpt = "".join(head)
+    if excerpt and not excerpt.endswith("\n"):
+        excerpt += "\n"
+    excerpt += f"... [{len(lines) - len(head) - len(tail)} lines omitted] ...\n" + "".join(tail)
+    return "head_tail", excerpt, count_tokens(excerpt, model)
+
 def should_include_file(file_path: str, file_size: int, params: Dict) -> bool:
     ext = os.path.splitext(file_path)[1].lower()
     
@@ -183,57 +592,390 @@ def should_ignore_path(path: str, ignore_patterns: List[str]) -> bool:
                     return True
     return False
 
-def convert_notebook_to_markdown(notebook_path: str) -> str:
-    logging.info(f"Converting notebook to markdown: {notebook_path}")
-    markdown_exporter = nbconvert.MarkdownExporter()
-    body, _ = markdown_exporter.from_filename(notebook_path)
+def gitignore_regex(pattern: str) -> "re.Pattern":
+    """Translate one gitignore glob ('*', '?', '[...]', '**') into a full-match regex"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            out.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append("[^/]*")  # '**' not bounded by slashes is an ordinary '*'
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and pattern.find("]", i + 2) != -1:
+            end = pattern.find("]", i + 2)
+            body = pattern[i + 1:end]
+            if body[0] in "!^":
+                body = "^" + body[1:]
+            out.append(f"[{body}]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out) + r"\Z")
+
+def parse_gitignore(ignore_file: str) -> List[Tuple["re.Pattern", bool, bool, bool]]:
+    """Rules from one ignore file as (regex, negated, dir_only, anchored)"""
+    rules = []
+    try:
+        with open(ignore_file, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
     
-    md_path = notebook_path.rsplit(".", 1)[0] + ".md"
-    with open(md_path, "w", encoding="utf-8") as f:
+    for line in lines:
+        line = re.sub(r"(?<!\\) +$", "", line)
+        if not line or line.startswith("#"):
+            continue
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        elif line.startswith("\\!") or line.startswith("\\#"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if line:
+            # A slash anywhere but the end anchors the pattern to the file's directory
+            rules.append((gitignore_regex(line.lstrip("/")), negated, dir_only, "/" in line))
+    return rules
+
+class GitIgnoreFilter:
+    """Paths git would leave out: from the git index in a work tree, else hierarchical .gitignore files"""
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.visible_files = None
+        self.visible_dirs = None
+        self.rule_chains = {}
+        
+        try:
+            listing = subprocess.run(["git", "-C", self.root] + GIT_VISIBLE_FILES_ARGS,
+                                     capture_output=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError):
+            logging.info(f"Not a git work tree, reading .gitignore files: {root}")
+            return
+        
+        # Tracked files plus untracked files that are not ignored
+        self.visible_files = set()
+        self.visible_dirs = set()
+        for entry in os.fsdecode(listing).split("\0"):
+            if not entry:
+                continue
+            rel_path = os.path.normpath(entry)
+            self.visible_files.add(rel_path)
+            parent = os.path.dirname(rel_path)
+            while parent and parent not in self.visible_dirs:
+                self.visible_dirs.add(parent)
+                parent = os.path.dirname(parent)
+        logging.info(f"Using git index for {root}: {len(self.visible_files)} files")
+    
+    def rules_for(self, directory: str) -> Tuple:
+        """Ignore rules in effect inside directory, as a chain of (base, rules)"""
+        chain = self.rule_chains.get(directory)
+        if chain is None:
+            if directory == self.root:
+                exclude = parse_gitignore(os.path.join(directory, ".git", "info", "exclude"))
+                chain = ((directory, exclude),) if exclude else ()
+            else:
+                chain = self.rules_for(os.path.dirname(directory))
+            rules = parse_gitignore(os.path.join(directory, ".gitignore"))
+            if rules:
+                chain = chain + ((directory, rules),)
+            self.rule_chains[directory] = chain
+        return chain
+    
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        path = os.path.abspath(path)
+        if self.visible_files is not None:
+            rel_path = os.path.relpath(path, self.root)
+            return rel_path not in self.visible_files and rel_path not in self.visible_dirs
+        
+        name = os.path.basename(path)
+        if name == ".git":
+            return True
+        ignored = False  # last matching rule wins, deeper .gitignore files come later
+        for base, rules in self.rules_for(os.path.dirname(path)):
+            rel_to_base = os.path.relpath(path, base).replace(os.sep, "/")
+            for regex, negated, dir_only, anchored in rules:
+                if (not dir_only or is_dir) and regex.match(rel_to_base if anchored else name):
+                    ignored = not negated
+        return ignored
+
+def truncate_output_text(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}\n... [{len(text) - max_chars} characters truncated]\n"
+
+def strip_notebook_outputs(notebook: "nbformat.NotebookNode", max_chars: int) -> None:
+    """Keep only text/plain for rich outputs and truncate output text in place (0 drops outputs)"""
+    for cell in notebook.cells:
+        if cell.get("cell_type") != "code":
+            continue
+        if max_chars <= 0:
+            cell["outputs"] = []
+            continue
+        for output in cell.get("outputs", []):
+            if output.get("output_type") == "stream":
+                output["text"] = truncate_output_text(output.get("text", ""), max_chars)
+            elif output.get("output_type") == "error":
+                output["traceback"] = [truncate_output_text("\n".join(output.get("traceback", [])), max_chars)]
+            elif "data" in output:
+                text = output["data"].get("text/plain")
+                output["data"] = {"text/plain": truncate_output_text(text, max_chars)} if text is not None else {}
+
+@lru_cache(maxsize=None)
+def get_markdown_exporter() -> "nbconvert.MarkdownExporter":
+    return nbconvert.MarkdownExporter()
+
+def export_notebook(notebook_path: str, cache_path: str, max_output_chars: int) -> str:
+    """Convert one notebook to markdown at cache_path (runs in a worker process)"""
+    notebook = nbformat.read(notebook_path, as_version=4)
+    strip_notebook_outputs(notebook, max_output_chars)
+    body, _ = get_markdown_exporter().from_notebook_node(notebook)
+    
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
         f.write(body)
+    os.replace(tmp_path, cache_path)  # never leave a partial cache entry
+    return cache_path
+
+class NotebookConverter:
+    """Notebook-to-markdown conversion cached outside the source tree by content hash, misses run in a process pool"""
+    def __init__(self, cache_dir: str, max_output_chars: int):
+        self.cache_dir = cache_dir
+        self.max_output_chars = max_output_chars
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_paths = {}
+        self.pending = {}
+        self.executor = None
+        self.hits = 0
+        self.misses = 0
+    
+    def cache_path(self, notebook_path: str) -> str:
+        cache_path = self.cache_paths.get(notebook_path)
+        if cache_path is None:
+            digest = hashlib.sha256()
+            with open(notebook_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            # Output trimming and the exporter version change the markdown too
+            digest.update(f"{self.max_output_chars}:{nbconvert.__version__}".encode())
+            cache_path = os.path.join(self.cache_dir, f"{digest.hexdigest()}.md")
+            self.cache_paths[notebook_path] = cache_path
+        return cache_path
     
-    logging.info(f"Notebook converted: {md_path}")
-    return md_path
+    def prefetch(self, notebook_paths: List[str]) -> None:
+        """Start converting uncached notebooks without waiting for them"""
+        for notebook_path in notebook_paths:
+            if notebook_path in self.pending:
+                continue
+            try:
+                cache_path = self.cache_path(notebook_path)
+            except OSError:
+                continue  # reported by convert()
+            if os.path.exists(cache_path):
+                continue
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor()
+            self.pending[notebook_path] = self.executor.submit(
+                export_notebook, notebook_path, cache_path, self.max_output_chars)
+    
+    def convert(self, notebook_path: str) -> str:
+        self.prefetch([notebook_path])
+        future = self.pending.pop(notebook_path, None)
+        if future is None:
+            self.hits += 1
+            return self.cache_path(notebook_path)
+        
+        self.misses += 1
+        logging.info(f"Converting notebook to markdown: {notebook_path}")
+        md_path = future.result()
+        logging.info(f"Notebook converted: {md_path}")
+        return md_path
+    
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+        logging.info(f"Notebook cache: {self.hits} hits, {self.misses} conversions")
 
-def process_directory_structured(
-    root_path: str,
-    params: Dict,
-    output_file,
-    project_info: Dict,
-    excluded_files: List[Tuple[str, int]]
-) -> None:
-    """Process directory with structured XML-like output"""
+def xml_attrs(attrs: Optional[Dict]) -> str:
+    """Single-quoted attribute string, values escaped; None values are left out"""
+    entities = {"'": "&apos;", "\n": "&#10;", "\r": "&#13;", "\t": "&#9;"}
+    return "".join(f" {name}='{escape(str(value), entities)}'" for name, value in (attrs or {}).items()
+                   if value is not None)
+
+class XmlEmitter:
+    """Streams dump elements to a text file with escaped attributes and text.
+    
+    File content goes in code fences by default; strict=True writes it as CDATA (base64 when XML
+    can't carry it) so the whole dump is well-formed XML that restore_codebase can stream back.
+    """
+    
+    def __init__(self, stream, strict: bool = False):
+        self.stream = stream
+        self.strict = strict
+    
+    def write(self, text: str) -> None:
+        self.stream.write(text)
+    
+    def start(self, tag: str, attrs: Optional[Dict] = None, indent: str = "", tail: str = "\n") -> None:
+        self.stream.write(f"{indent}<{tag}{xml_attrs(attrs)}>{tail}")
+    
+    def end(self, tag: str, tail: str = "\n") -> None:
+        self.stream.write(f"</{tag}>{tail}")
+    
+    def element(self, tag: str, attrs: Optional[Dict] = None, text: str = "", indent: str = "", tail: str = "\n") -> None:
+        self.stream.write(f"{indent}<{tag}{xml_attrs(attrs)}>{escape(text)}</{tag}>{tail}")
     
-    # Write project header
-    output_file.write("<codebase>\n")
-    output_file.write(f"<project type='{project_info['type']}' language='{project_info['language']}'>\n")
+    def content_encoding(self, text: str) -> Optional[str]:
+        """'base64' when strict output can't hold text verbatim in CDATA, else None"""
+        return "base64" if self.strict and XML_UNSAFE_RE.search(text) else None
+    
+    def content(self, text: str, encoding: Optional[str] = None) -> None:
+        if not self.strict:
+            self.stream.write("\n```\n")
+            self.stream.write(text)
+            if not text.endswith('\n'):
+                self.stream.write('\n')
+            self.stream.write("```\n")
+        elif encoding == "base64":
+            self.stream.write(base64.b64encode(text.encode("utf-8", "surrogatepass")).decode("ascii"))
+        else:
+            self.stream.write("<![CDATA[" + text.replace("]]>", "]]]]><![CDATA[>") + "]]>")
+
+def restore_codebase(dump_path: str, dest_dir: str) -> Tuple[int, int]:
+    """Recreate the files of a --strict-xml dump under dest_dir; returns (restored, skipped).
+    
+    The dump is read with iterparse and each <file> is dropped once written, so memory holds one
+    file at a time however large the dump. Excluded, failed and compressed entries are skipped.
+    """
+    dest_root = os.path.realpath(dest_dir)
+    restored = skipped = 0
+    files_element = None
+    for event, elem in ET.iterparse(dump_path, events=("start", "end")):
+        if elem.tag == "files":
+            files_element = elem if event == "start" else None
+            continue
+        if event != "end" or elem.tag != "file" or files_element is None:
+            continue
+        
+        if elem.get("excluded") or elem.get("error") or elem.get("compressed"):
+            skipped += 1
+        else:
+            rel_path = elem.get("path")
+            target = os.path.realpath(os.path.join(dest_root, rel_path))
+            if os.path.commonpath([dest_root, target]) != dest_root:
+                raise ValueError(f"Path escapes the destination directory: {rel_path}")
+            text = elem.text or ""
+            data = base64.b64decode(text) if elem.get("encoding") == "base64" else text.encode("utf-8")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(data)
+            if elem.get("executable") == "true":
+                os.chmod(target, os.stat(target).st_mode | 0o111)
+            restored += 1
+        files_element.clear()
+    return restored, skipped
+
+def count_file_tokens(path: str, model: Optional[str] = None) -> int:
+    """Token count of a text file, encoded in newline-aligned chunks so a large dump is never read whole"""
+    total, pending, pending_chars = 0, [], 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            pending.append(line)
+            pending_chars += len(line)
+            if pending_chars >= COUNT_CHUNK_CHARS:
+                total += count_tokens("".join(pending), model)
+                pending, pending_chars = [], 0
+    if pending:
+        total += count_tokens("".join(pending), model)
+    return total
+
+def write_project_header(out: XmlEmitter, project_info: Dict, root_path: str) -> None:
+    out.start("project", {"type": project_info['type'], "language": project_info['language']})
     
     if project_info['entry_points']:
-        output_file.write("<entry_points>\n")
+        out.start("entry_points")
         for ep in project_info['entry_points']:
-            output_file.write(f"  <entry>{os.path.relpath(ep, root_path)}</entry>\n")
-        output_file.write("</entry_points>\n")
+            out.element("entry", text=os.path.relpath(ep, root_path), indent="  ")
+        out.end("entry_points")
     
     if project_info['dependency_files']:
-        output_file.write("<dependencies>\n")
+        out.start("dependencies")
         for dep in project_info['dependency_files']:
-            output_file.write(f"  <file>{os.path.relpath(dep, root_path)}</file>\n")
-        output_file.write("</dependencies>\n")
+            out.element("file", text=os.path.relpath(dep, root_path), indent="  ")
+        out.end("dependencies")
     
     if project_info['test_directories']:
-        output_file.write("<test_dirs>\n")
+        out.start("test_dirs")
         for test_dir in project_info['test_directories']:
-            output_file.write(f"  <dir>{os.path.relpath(test_dir, root_path)}</dir>\n")
-        output_file.write("</test_dirs>\n")
+            out.element("dir", text=os.path.relpath(test_dir, root_path), indent="  ")
+        out.end("test_dirs")
     
-    output_file.write("</project>\n\n")
+    out.end("project", "\n\n")
+
+def process_directory_structured(
+    root_path: str,
+    params: Dict,
+    output_file,
+    excluded_files: List[Tuple[str, int]]
+) -> Dict:
+    """Process directory with structured XML-like output in one pruned walk; returns the detected project info"""
+    detector = ProjectDetector(root_path)
     
-    # Write files in structured format
-    output_file.write("<files>\n")
+    # The <project> header is only known once the walk is done, so the files section is
+    # spooled to a temporary file and copied in after the header
+    out = XmlEmitter(output_file, params["strict_xml"])
+    with tempfile.TemporaryFile("w+", encoding="utf-8", newline="") as files_section:
+        files_out = XmlEmitter(files_section, params["strict_xml"])
+        if params["token_budget"] or params["order"] != "walk":
+            write_planned_files(root_path, params, files_out, detector, excluded_files)
+        else:
+            # Write files in structured format
+            files_out.start("files")
+            for file_path, rel_path, file_size, _ in iter_included_files(root_path, params, excluded_files, detector.visit):
+                write_file_entry(files_out, file_path, rel_path, file_size, params)
+            files_out.end("files")
+        
+        if out.strict:
+            out.write(XML_DECLARATION)
+        out.start("codebase")
+        write_project_header(out, detector.project_info, root_path)
+        if params["import_graph"] is not None:
+            params["import_graph"].write(out)
+        files_section.seek(0)
+        shutil.copyfileobj(files_section, output_file)
     
+    out.end("codebase")
+    return detector.project_info
+
+def iter_included_files(root_path: str, params: Dict, excluded_files: List[Tuple[str, int]], visitor=None):
+    """Walk root_path, yielding (file_path, rel_path, size, mtime) for each file that passes the filters.
+    visitor(root, dirs, files) sees every directory entered, before ignored subdirectories are pruned."""
+    gitignore = params["gitignore"]
     for root, dirs, files in os.walk(root_path):
-        # Skip ignored directories
-        dirs[:] = [d for d in dirs if not should_ignore_path(os.path.join(root, d), params["ignore_patterns"])]
+        if visitor is not None:
+            visitor(root, dirs, files)
+        # Skip ignored directories (pruned here, so os.walk never descends into them)
+        dirs[:] = [d for d in dirs if not should_ignore_path(os.path.join(root, d), params["ignore_patterns"])
+                   and not (gitignore and gitignore.ignored(os.path.join(root, d), True))]
+        
+        # Start converting this directory's notebooks in parallel
+        params["notebook_converter"].prefetch([
+            os.path.join(root, f) for f in files
+            if f.endswith(".ipynb") and not should_ignore_path(os.path.join(root, f), params["ignore_patterns"])])
         
         for file in sorted(files):
             file_path = os.path.join(root, file)
@@ -241,63 +983,249 @@ def process_directory_structured(
             
             if should_ignore_path(file_path, params["ignore_patterns"]):
                 continue
+            if gitignore and gitignore.ignored(file_path, False):
+                continue
             
             try:
-                file_size = os.path.getsize(file_path)
+                stat = os.stat(file_path)
             except OSError:
                 continue
+            file_size = stat.st_size
             
             # Handle notebooks
             if file.endswith(".ipynb"):
                 try:
-                    md_path = convert_notebook_to_markdown(file_path)
+                    md_path = params["notebook_converter"].convert(file_path)
+                    rel_path = os.path.relpath(file_path.rsplit(".", 1)[0] + ".md", root_path)
                     file_path = md_path
-                    rel_path = os.path.relpath(md_path, root_path)
                     file_size = os.path.getsize(md_path)
                 except Exception as e:
                     logging.error(f"Error converting notebook {file_path}: {str(e)}")
                     continue
             
             if should_include_file(file_path, file_size, params):
-                metadata = get_file_metadata(file_path)
-                metadata["relative_path"] = rel_path
-                
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-                    
-                    content_tokens = count_tokens(content)
-                    if content_tokens <= params["token_limit"]:
-                        # Extract imports for dependency mapping
-                        imports = extract_imports_dependencies(content, file_path)
-                        
-                        # Write structured file entry
-                        output_file.write(f"<file path='{rel_path}' size='{file_size}' ext='{metadata['extension']}'")
-                        if metadata.get('executable'):
-                            output_file.write(" executable='true'")
-                        if imports:
-                            output_file.write(f" imports='{','.join(imports[:5])}'")  # Limit to first 5 imports
-                        output_file.write(">\n")
-                        
-                        # Content with clear delimiters
-                        output_file.write("```\n")
-                        output_file.write(content)
-                        if not content.endswith('\n'):
-                            output_file.write('\n')
-                        output_file.write("```\n")
-                        output_file.write("</file>\n\n")
-                    else:
-                        output_file.write(f"<file path='{rel_path}' size='{file_size}' excluded='token_limit'></file>\n")
-                        logging.info(f"Content excluded due to token limit: {file_path}")
-                        
-                except Exception as e:
-                    logging.error(f"Error processing file {file_path}: {str(e)}")
-                    output_file.write(f"<file path='{rel_path}' error='processing_failed'></file>\n")
+                yield file_path, rel_path, file_size, stat.st_mtime
             else:
                 excluded_files.append((file_path, file_size))
+
+def write_file_entry(out: XmlEmitter, file_path: str, rel_path: str, file_size: int, params: Dict,
+                     content_tokens: Optional[int] = None, excerpt: Optional[Tuple[str, str, int]] = None) -> None:
+    """Write one <file> element with its content, or the reason it was left out.
+    content_tokens and excerpt, when the planning pass already computed them, are used as is."""
+    metadata = get_file_metadata(file_path)
+    metadata["relative_path"] = rel_path
     
-    output_file.write("</files>\n")
-    output_file.write("</codebase>\n")
+    try:
+        content = read_text_file(file_path)
+        if params["import_graph"] is not None:
+            params["import_graph"].add(rel_path, content)
+        
+        if content_tokens is None:
+            content_tokens = count_tokens(content, params["model"])
+        if content_tokens <= params["token_limit"] or (params["outline_oversized"]
+                                                       and not needs_excerpt(content_tokens, params)):
+            # Extract imports for dependency mapping; with --dependency-graph every import is already
+            # listed, resolved, in <dependency_graph>, so the regex guess would only contradict it
+            imports = extract_imports_dependencies(content, file_path) if params["import_graph"] is None else []
+            
+            # Write structured file entry
+            encoding = out.content_encoding(content)
+            out.start("file", {"path": rel_path, "size": file_size, "ext": metadata['extension'],
+                               "executable": "true" if metadata.get('executable') else None,
+                               "imports": ",".join(imports[:5]) or None,  # Limit to first 5 imports
+                               "encoding": encoding}, tail="")
+            
+            # Content with clear delimiters
+            out.content(content, encoding)
+            out.end("file", "\n\n")
+        elif params["outline_oversized"]:
+            kind, excerpt, excerpt_tokens = excerpt or make_excerpt(content, file_path, params)
+            encoding = out.content_encoding(excerpt)
+            out.start("file", {"path": rel_path, "size": file_size, "ext": metadata['extension'], "compressed": kind,
+                               "tokens": content_tokens, "excerpt_tokens": excerpt_tokens, "encoding": encoding}, tail="")
+            out.content(excerpt, encoding)
+            out.end("file", "\n\n")
+            logging.info(f"Content compressed to a {kind} excerpt: {file_path}")
+        else:
+            out.element("file", {"path": rel_path, "size": file_size, "excluded": "token_limit"})
+            logging.info(f"Content excluded due to token limit: {file_path}")
+            
+    except BinaryFileError:
+        logging.info(f"Skipped binary file: {file_path}")
+        out.element("file", {"path": rel_path, "size": file_size, "excluded": "binary"})
+    except Exception as e:
+        logging.error(f"Error processing file {file_path}: {str(e)}")
+        out.element("file", {"path": rel_path, "error": "processing_failed"})
+
+def pack_files(candidates: List[Dict], budget: int, project_info: Dict, root_path: str,
+               entry_closure: Set[str] = frozenset()) -> Tuple[List[Dict], int]:
+    """Choose files for a token budget; returns them in output order with the tokens they use.
+    
+    Each file is worth 1 (coverage) plus PACK_WEIGHTS bonuses for entry points, dependency/config
+    manifests, files the entry points transitively import (entry_closure), small config files and
+    recency. Entry points and manifests are pinned first, the rest is a greedy knapsack by value per
+    token, so packing is O(n log n).
+    """
+    if not candidates:
+        return [], 0
+    relative = lambda paths: {os.path.relpath(path, root_path) for path in paths}
+    entry_points = relative(project_info["entry_points"])
+    manifests = relative(project_info["dependency_files"] + project_info["config_files"] + project_info["build_files"])
+    oldest = min(c["mtime"] for c in candidates)
+    span = (max(c["mtime"] for c in candidates) - oldest) or 1.0
+    
+    pinned, rest = [], []
+    for index, c in enumerate(candidates):
+        c["index"] = index
+        c["value"] = 1.0 + PACK_WEIGHTS["recent"] * (c["mtime"] - oldest) / span
+        if c["rel_path"] in entry_points:
+            c["value"] += PACK_WEIGHTS["entry_point"]
+        elif c["rel_path"].replace(os.sep, "/") in entry_closure:
+            c["value"] += PACK_WEIGHTS["entry_dependency"]
+        if c["rel_path"] in manifests:
+            c["value"] += PACK_WEIGHTS["manifest"]
+        elif os.path.splitext(c["rel_path"])[1].lower() in CONFIG_EXTENSIONS and c["tokens"] <= SMALL_CONFIG_TOKENS:
+            c["value"] += PACK_WEIGHTS["small_config"]
+        (pinned if c["rel_path"] in entry_points or c["rel_path"] in manifests else rest).append(c)
+    
+    pinned.sort(key=lambda c: (-c["value"], c["index"]))
+    rest.sort(key=lambda c: (-c["value"] / c["cost"], c["index"]))
+    
+    used = 0
+    chosen_pinned, chosen_rest = [], []
+    for group, chosen in ((pinned, chosen_pinned), (rest, chosen_rest)):
+        for c in group:
+            if used + c["cost"] <= budget:
+                chosen.append(c)
+                used += c["cost"]
+    
+    # Pinned files lead, everything else keeps traversal order
+    chosen_rest.sort(key=lambda c: c["index"])
+    return chosen_pinned + chosen_rest, used
+
+def entry_point_closure(entry_points: List[str], imports: Dict[str, List[str]]) -> List[str]:
+    """Entry points followed by everything they transitively import, breadth first"""
+    ordered, seen = [], set()
+    queue = deque(entry_points)
+    while queue:
+        path = queue.popleft()
+        if path in seen:
+            continue
+        seen.add(path)
+        ordered.append(path)
+        queue.extend(dep for dep in imports.get(path, []) if dep not in seen)
+    return ordered
+
+def dependency_order(candidates: List[Dict], graph: Dict[str, Tuple[List[str], List[str]]],
+                     entry_points: List[str]) -> List[Dict]:
+    """Entry points and their transitive dependencies first, then the rest topologically sorted so
+    importers come before the files they import. Walk order breaks ties and cycles."""
+    by_path = {c["rel_path"].replace(os.sep, "/"): c for c in candidates}
+    paths = list(by_path)
+    index = {path: i for i, path in enumerate(paths)}
+    imports = {path: [dep for dep in graph.get(path, ([], []))[0] if dep in by_path] for path in paths}
+    
+    ordered = entry_point_closure([ep for ep in entry_points if ep in by_path], imports)
+    remaining = set(paths) - set(ordered)
+    
+    # Kahn's algorithm over the remaining files, counting importers that are still waiting
+    importers = dict.fromkeys(remaining, 0)
+    for path in remaining:
+        for dep in imports[path]:
+            if dep in remaining:
+                importers[dep] += 1
+    ready = [index[path] for path in remaining if importers[path] == 0]
+    heapq.heapify(ready)
+    while remaining:
+        if not ready:
+            # Only cycles are left: release the earliest file in walk order
+            heapq.heappush(ready, min(index[path] for path in remaining))
+        path = paths[heapq.heappop(ready)]
+        if path not in remaining:
+            continue
+        remaining.discard(path)
+        ordered.append(path)
+        for dep in imports[path]:
+            if dep in remaining:
+                importers[dep] -= 1
+                if importers[dep] == 0:
+                    heapq.heappush(ready, index[dep])
+    return [by_path[path] for path in ordered]
+
+def measure_candidates(batch: List[Tuple[Dict, str]], params: Dict) -> None:
+    """Set tokens, excerpt and packing cost of (candidate, content) pairs, tokenized in one batch"""
+    if not batch:
+        return
+    counts = count_tokens_batch([content for _, content in batch] + [c["rel_path"] for c, _ in batch], params["model"])
+    for (candidate, content), tokens, path_tokens in zip(batch, counts, counts[len(batch):]):
+        candidate["tokens"] = emitted_tokens = tokens
+        if needs_excerpt(tokens, params):
+            candidate["excerpt"] = make_excerpt(content, candidate["path"], params)
+            emitted_tokens = candidate["excerpt"][2]
+        candidate["cost"] = emitted_tokens + path_tokens + FILE_ENTRY_OVERHEAD_TOKENS
+
+def write_planned_files(root_path: str, params: Dict, out: XmlEmitter, detector: ProjectDetector,
+                        excluded_files: List[Tuple[str, int]]) -> None:
+    """Collect every file before writing, then write the --token-budget selection and/or the
+    --order dependency ordering"""
+    graph = params["import_graph"]
+    own_graph = graph is None and params["order"] == "dependency"
+    if own_graph:
+        graph = ImportGraph(root_path, params["import_cache"])  # for ordering only, not written
+    
+    candidates = []
+    batch = []  # (candidate, content) pairs waiting for one batched encode
+    for file_path, rel_path, file_size, mtime in iter_included_files(root_path, params, excluded_files, detector.visit):
+        candidate = {"path": file_path, "rel_path": rel_path, "size": file_size, "mtime": mtime, "tokens": None,
+                     "excerpt": None}
+        candidates.append(candidate)
+        try:
+            content = read_text_file(file_path)
+        except Exception as e:
+            logging.info(f"Unreadable, kept out of packing: {file_path}: {str(e)}")
+            continue
+        if graph is not None:
+            graph.add(rel_path, content)
+        batch.append((candidate, content))
+        if len(batch) >= PLAN_TOKENIZE_BATCH:
+            measure_candidates(batch, params)
+            batch = []
+    measure_candidates(batch, params)
+    
+    deps = graph.resolve() if graph is not None else {}
+    entry_points = [os.path.relpath(ep, root_path).replace(os.sep, "/") for ep in detector.project_info["entry_points"]]
+    
+    chosen = candidates
+    if params["token_budget"]:
+        # Binary, unreadable and (without outlines) over-limit files can't be packed, but still get
+        # their excluded/error entry like in walk mode; those one-liners are paid for up front
+        packable, left_out = [], []
+        for c in candidates:
+            if c["tokens"] is None or (c["tokens"] > params["token_limit"] and not params["outline_oversized"]):
+                left_out.append(c)
+            else:
+                packable.append(c)
+        reserved = sum(count_tokens(c["rel_path"], params["model"]) + FILE_ENTRY_OVERHEAD_TOKENS for c in left_out)
+        imports = {path: internal for path, (internal, _) in deps.items()}
+        start = time.perf_counter()
+        chosen, used = pack_files(packable, max(params["token_budget"] - reserved, 0), detector.project_info,
+                                  root_path, set(entry_point_closure(entry_points, imports)))
+        logging.info(f"Packed {len(chosen)}/{len(packable)} files into {used} tokens "
+                     f"in {time.perf_counter() - start:.3f}s")
+        out.element("packing", {"budget": params['token_budget'], "tokens": used + reserved, "files": len(chosen),
+                                "omitted": len(packable) - len(chosen), "excluded": len(left_out) or None},
+                    tail="\n\n")
+        chosen = chosen + left_out
+    
+    if params["order"] == "dependency":
+        chosen = dependency_order(chosen, deps, entry_points)
+    if own_graph:
+        graph.close()
+    
+    out.start("files")
+    for c in chosen:
+        write_file_entry(out, c["path"], c["rel_path"], c["size"], params, c["tokens"], c["excerpt"])
+    out.end("files")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -331,31 +1259,65 @@ def main():
     parser.add_argument("--output", default=DEFAULT_OUTPUT_FILE)
     parser.add_argument("--split-threshold", type=int, default=1000000)
     parser.add_argument("--log-file", default="directory_processing.log")
+    parser.add_argument("--model", default=None, help="Model or tiktoken encoding for token counts")
+    parser.add_argument("--notebook-cache-dir", default=DEFAULT_NOTEBOOK_CACHE_DIR,
+                        help="Directory caching notebooks converted to markdown")
+    parser.add_argument("--notebook-max-output-chars", type=int, default=DEFAULT_NOTEBOOK_MAX_OUTPUT_CHARS,
+                        help="Truncate each notebook cell output to this many characters (0 drops outputs)")
+    parser.add_argument("--token-budget", type=int, default=None,
+                        help="Pack the most valuable files (entry points, manifests, recent changes) into this many tokens")
+    parser.add_argument("--outline-oversized", action="store_true", default=False,
+                        help="Replace files over --token-limit with a symbol outline (Python) or head/tail excerpt")
+    parser.add_argument("--outline-tokens", type=int, default=DEFAULT_OUTLINE_TOKENS,
+                        help="Token cap for each outline or excerpt")
+    parser.add_argument("--order", choices=ORDER_MODES, default="walk",
+                        help="File order: directory walk, or entry points and their imports first, then topological")
+    parser.add_argument("--dependency-graph", action="store_true", default=False,
+                        help="Emit a <dependency_graph> of imports resolved to in-repo files")
+    parser.add_argument("--import-cache", default=DEFAULT_IMPORT_CACHE,
+                        help="SQLite file caching parsed imports by content hash")
+    parser.add_argument("--gitignore", action="store_true", default=False,
+                        help="Skip whatever git ignores (git index in a repo, else .gitignore files)")
+    parser.add_argument("--strict-xml", action="store_true", default=False,
+                        help="Write well-formed XML, with file content as CDATA instead of code fences")
+    parser.add_argument("--restore", metavar="DUMP",
+                        help="Recreate the files of a --strict-xml DUMP into directory_path instead of processing it")
     
     args = parser.parse_args()
     
     setup_logging(args.log_file, args.enable_logging)
     logging.info("Starting enhanced directory processing")
     
+    if args.restore:
+        try:
+            restored, skipped = restore_codebase(args.restore, args.directory_path)
+        except (ET.ParseError, ValueError, OSError) as e:
+            logging.error(f"Restore failed: {str(e)}")
+            print(f"Error: Could not restore {args.restore} (is it a --strict-xml dump?): {str(e)}")
+            sys.exit(1)
+        print(f"Restored {restored} files into {args.directory_path} ({skipped} entries without full content skipped)")
+        return
+    
     if not os.path.exists(args.directory_path) or not os.path.isdir(args.directory_path):
         logging.error(f"Invalid directory: {args.directory_path}")
         print(f"Error: Invalid directory: {args.directory_path}")
         sys.exit(1)
     
-    # Detect project structure
-    project_info = detect_project_type(args.directory_path)
-    logging.info(f"Detected project type: {project_info}")
-    
     params = vars(args)
+    params["gitignore"] = GitIgnoreFilter(args.directory_path) if args.gitignore else None
+    params["notebook_converter"] = NotebookConverter(args.notebook_cache_dir, args.notebook_max_output_chars)
+    params["import_graph"] = ImportGraph(args.directory_path, args.import_cache) if args.dependency_graph else None
     excluded_files = []
     
     with open(args.output, "w", encoding="utf-8") as output_file:
-        process_directory_structured(args.directory_path, params, output_file, project_info, excluded_files)
+        project_info = process_directory_structured(args.directory_path, params, output_file, excluded_files)
+    if params["import_graph"] is not None:
+        params["import_graph"].close()
+    logging.info(f"Detected project type: {project_info}")
+    params["notebook_converter"].close()
     
     # Token counting and splitting logic (similar to original)
-    with open(args.output, "r", encoding="utf-8") as f:
-        content = f.read()
-        total_tokens = count_tokens(content)
+    total_tokens = count_file_tokens(args.output, args.model)
     
     logging.info(f"Total tokens: {total_tokens}")
     print(f"Processing complete. Total tokens: {total_tokens}")
@@ -7,7 +7,8 @@ import json
 import logging
 from tqdm import tqdm
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
+from functools import lru_cache
 import nbconvert
 import fnmatch
 
@@ -28,9 +29,26 @@ def setup_logging(log_file: str, enable_logging: bool = True):
         logging.basicConfig(level=logging.ERROR, handlers=[logging.NullHandler()])
 
 
-def count_tokens(text: str) -> int:
-    encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text))
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model: Optional[str] = None) -> "tiktoken.Encoding":
+    """
+    Return a tiktoken encoder, built once per process and then reused.
+    `model` may be a model name (e.g. "gpt-4o") or an encoding name;
+    None selects cl100k_base.
+    """
+    if model is None:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(model)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    return len(get_encoder(model).encode_ordinary(text))
 
 
 def should_include_file(file_path: str, file_size: int, params: Dict) -> bool:
@@ -162,7 +180,7 @@ def process_directory(
                     with open(item_path, "r", encoding="utf-8") as f:
                         content = f.read()
 
-                    if count_tokens(content) <= params["token_limit"]:
+                    if count_tokens(content, params["model"]) <= params["token_limit"]:
                         output_file.write(f"{'  ' * (current_depth + 1)}Content:\n")
                         output_file.write(f"{content}\n\n")
                     else:
@@ -302,6 +320,11 @@ def main():
         default=1000000,
         help="Token threshold for splitting output files",
     )
+    parser.add_argument(
+        "--model",
+        default=None,
+        help="Model or tiktoken encoding used for token counts (default: cl100k_base)",
+    )
     parser.add_argument(
         "--log-file", default="directory_processing.log", help="Log file name"
     )
@@ -342,7 +365,7 @@ def main():
     for file_name in output_files:
         with open(file_name, "r", encoding="utf-8") as f:
             content = f.read()
-            file_tokens = count_tokens(content)
+            file_tokens = count_tokens(content, args.model)
             total_tokens += file_tokens
             logging.info(f"{file_name}: {file_tokens} tokens")
 
@@ -358,7 +381,7 @@ def main():
         for file_name in output_files:
             with open(file_name, "r", encoding="utf-8") as f:
                 content = f.read()
-                content_tokens = count_tokens(content)
+                content_tokens = count_tokens(content, args.model)
 
                 if current_tokens + content_tokens > args.split_threshold:
                     split_file_name = f"{args.output}.split{part}"
@@ -5,20 +5,430 @@ Generates a working website from your docs in under 20 minutes
 """
 
 import os
+import re
+import time
+import gzip
+import json
 import shutil
+import hashlib
+import argparse
+import subprocess
+import threading
+import queue
+import tempfile
 from pathlib import Path
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from string import Formatter
+from html import unescape
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import markdown
-from datetime import datetime
+from datetime import datetime, timezone
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # the dev server falls back to polling
+    Observer = None
+    FileSystemEventHandler = object
+
+try:
+    import brotli
+except ImportError:  # only gzip twins are written
+    brotli = None
+
+MANIFEST_NAME = ".build-manifest.json"
+MANIFEST_VERSION = 2
+DEFAULT_LISTING_PAGE_SIZE = 500
+# Stems whose .html name a directory listing page uses (index.html, index-2.html, ...)
+LISTING_STEM_RE = re.compile(r'index(-\d+)?')
+# Dot-prefixed so no source directory (scan_tree drops hidden ones) can render into it
+SEARCH_DIR = ".search"
+# The only files write_search_index creates, so the only ones its cleanup may remove
+SEARCH_OUTPUT_RE = re.compile(r'(pages|[a-z0-9_]{2})\.json|search\.[0-9a-f]{12}\.js')
+SEARCH_TERMS_NAME = ".search-terms.json"
+TIMESTAMP_MODES = ('now', 'mtime', 'git')
+COMPRESSIBLE_SUFFIXES = ('.html', '.css', '.js', '.json')
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+DEFAULT_COMPRESS_MIN_SIZE = 1024
+
+STYLESHEET = """* { margin: 0; padding: 0; box-sizing: border-box; }
+body { 
+    font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
+    line-height: 1.6; 
+    color: #333; 
+    background: #fff;
+}
+.container { max-width: 1200px; margin: 0 auto; padding: 20px; }
+.header { 
+    background: #2c3e50; 
+    color: white; 
+    padding: 1rem 0; 
+    position: sticky; 
+    top: 0; 
+    z-index: 100;
+    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+}
+.home-btn { 
+    position: fixed; 
+    top: 20px; 
+    right: 20px; 
+    background: #e74c3c; 
+    color: white; 
+    padding: 12px 16px; 
+    border-radius: 50px; 
+    text-decoration: none; 
+    font-weight: bold; 
+    z-index: 1000;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.2);
+    transition: all 0.3s;
+}
+.home-btn:hover { background: #c0392b; transform: translateY(-2px); }
+.breadcrumb { 
+    background: #ecf0f1; 
+    padding: 10px 0; 
+    margin-bottom: 20px; 
+    font-size: 14px;
+}
+.breadcrumb a { color: #3498db; text-decoration: none; }
+.breadcrumb a:hover { text-decoration: underline; }
+.content { 
+    background: white; 
+    padding: 2rem; 
+    border-radius: 8px; 
+    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+}
+.file-list { 
+    display: grid; 
+    grid-template-columns: repeat(auto-fill, minmax(300px, 1fr)); 
+    gap: 1rem; 
+    margin: 2rem 0; 
+}
+.file-item { 
+    padding: 1rem; 
+    border: 1px solid #ddd; 
+    border-radius: 8px; 
+    background: #f8f9fa;
+    transition: all 0.3s;
+}
+.file-item:hover { 
+    transform: translateY(-2px); 
+    box-shadow: 0 4px 12px rgba(0,0,0,0.15); 
+}
+.file-item a { 
+    color: #2c3e50; 
+    text-decoration: none; 
+    font-weight: 500; 
+    display: block;
+}
+.file-item a:hover { color: #3498db; }
+.file-type { 
+    font-size: 12px; 
+    color: #7f8c8d; 
+    margin-top: 5px; 
+}
+.tree { font-family: monospace; white-space: pre-line; background: #f8f9fa; padding: 1rem; border-radius: 8px; }
+pre { background: #2c3e50; color: #ecf0f1; padding: 1rem; border-radius: 8px; overflow-x: auto; }
+code { background: #ecf0f1; padding: 2px 4px; border-radius: 4px; font-size: 0.9em; }
+pre code { background: none; padding: 0; }
+h1, h2, h3, h4, h5, h6 { color: #2c3e50; margin: 1.5rem 0 1rem 0; }
+h1 { border-bottom: 3px solid #3498db; padding-bottom: 10px; }
+a { color: #3498db; }
+a:hover { color: #2980b9; }
+.footer { 
+    text-align: center; 
+    padding: 2rem; 
+    color: #7f8c8d; 
+    border-top: 1px solid #ecf0f1; 
+    margin-top: 3rem; 
+}
+.search-box { 
+    width: 100%; 
+    max-width: 400px; 
+    margin-top: 0.5rem; 
+    padding: 6px 10px; 
+    border: none; 
+    border-radius: 4px; 
+    font-size: 14px; 
+}
+.search-results { 
+    position: absolute; 
+    max-width: 600px; 
+    background: white; 
+    border-radius: 8px; 
+    box-shadow: 0 4px 12px rgba(0,0,0,0.2); 
+}
+.search-results a { display: block; padding: 8px 12px; color: #2c3e50; text-decoration: none; }
+.search-results a:hover { background: #ecf0f1; }
+.pagination { 
+    display: flex; 
+    justify-content: center; 
+    gap: 1.5rem; 
+    margin: 1rem 0; 
+    color: #7f8c8d; 
+}
+@media (max-width: 768px) {
+    .container { padding: 10px; }
+    .file-list { grid-template-columns: 1fr; }
+    .content { padding: 1rem; }
+}
+"""
+
+LISTING_DIR_ITEM = '''
+                <div class="file-item">
+                    <a href="{path}">{name}/</a>
+                    <div class="file-type">{type}</div>
+                </div>'''
+
+LISTING_FILE_ITEM = '''
+                <div class="file-item">
+                    <a href="{path}">{name}</a>
+                    <div class="file-type">{type}</div>
+                </div>'''
+
+TAG_RE = re.compile(r'<[^>]+>')
+TERM_RE = re.compile(r'\w{2,}')
+MAX_TERM_LENGTH = 32
+
+SEARCH_BOX = '''
+            <input id="search-input" class="search-box" type="search" placeholder="Search docs..." autocomplete="off">
+            <div id="search-results" class="search-results"></div>'''
+
+# Queries the sharded index written by FastSiteGenerator.write_search_index.
+# Terms and shard keys must be derived exactly as in extract_terms/shard_key.
+# URLs resolve against the script's own location, so the site works under a project prefix.
+SEARCH_JS = r"""(function () {
+  var input = document.getElementById('search-input');
+  var results = document.getElementById('search-results');
+  if (!input) { return; }
+  var root = new URL('./', document.currentScript.src).href;
+  var site = new URL('../', document.currentScript.src).href;
+  var cache = {};
+  var timer = null;
+
+  function load(name) {
+    if (!(name in cache)) {
+      cache[name] = fetch(root + name + '.json').then(function (r) { return r.ok ? r.json() : {}; });
+    }
+    return cache[name];
+  }
+
+  function shardKey(term) { return term.slice(0, 2).replace(/[^a-z0-9]/g, '_'); }
+
+  // Page ids are delta-encoded; the last query term also matches as a prefix
+  function lookup(term, prefix) {
+    return load(shardKey(term)).then(function (shard) {
+      var ids = {};
+      Object.keys(shard).forEach(function (key) {
+        if (key === term || (prefix && key.indexOf(term) === 0)) {
+          var id = 0;
+          shard[key].forEach(function (delta) { id += delta; ids[id] = true; });
+        }
+      });
+      return ids;
+    });
+  }
+
+  function search(query) {
+    var terms = query.toLowerCase().match(/[\p{L}\p{N}_]{2,}/gu) || [];
+    if (!terms.length) { results.innerHTML = ''; return; }
+    var lookups = terms.map(function (term, i) { return lookup(term, i === terms.length - 1); });
+    Promise.all([load('pages')].concat(lookups)).then(function (lists) {
+      var pages = lists.shift();
+      var hits = Object.keys(lists[0]).filter(function (id) {
+        return lists.every(function (ids) { return ids[id]; });
+      });
+      results.innerHTML = hits.slice(0, 20).map(function (id) {
+        var a = document.createElement('a');
+        a.href = site + pages[id][0];
+        a.textContent = pages[id][1];
+        return a.outerHTML;
+      }).join('') || '<a>No matches</a>';
+    });
+  }
+
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () { search(input.value); }, 150);
+  });
+})();
+"""
+
+def content_hashed_name(stem, text, suffix):
+    """File name that changes whenever the content does, so it can be cached forever"""
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+    return f"{stem}.{digest}{suffix}"
+
+def unlink_output(path):
+    """Remove an output file together with its pre-compressed twins"""
+    for suffix in ('',) + COMPRESSED_SUFFIXES:
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+def compress_file(path, min_size):
+    """Write .gz (and .br when brotli is installed) twins of one file.
+    
+    Twins newer than their source are left alone; files below min_size lose
+    any twins they had. Returns the number of twins written.
+    """
+    stat = path.stat()
+    twins = [(Path(f"{path}.gz"), lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        twins.append((Path(f"{path}.br"), lambda data: brotli.compress(data, quality=11)))
+    
+    if stat.st_size < min_size:
+        for twin, _ in twins:
+            twin.unlink(missing_ok=True)
+        return 0
+    
+    data = None
+    written = 0
+    for twin, compress in twins:
+        try:
+            if twin.stat().st_mtime_ns >= stat.st_mtime_ns:
+                continue
+        except OSError:
+            pass
+        data = data if data is not None else path.read_bytes()
+        twin.write_bytes(compress(data))
+        written += 1
+    return written
+
+def write_if_changed(path, text):
+    """Write text to path unless the file already holds exactly these bytes"""
+    data = text.encode('utf-8')
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    path.write_bytes(data)
+    return True
+
+# Generator instance owned by each pool worker, set once by _init_worker
+_worker_generator = None
+
+def _init_worker(generator):
+    """Process pool initializer: keep one generator per worker process"""
+    global _worker_generator
+    _worker_generator = generator
+
+def _render_page_worker(paths):
+    """Render one page in a worker; errors come back as text so the parent reports them"""
+    md_path, relative_path, timestamp = paths
+    try:
+        return _worker_generator.render_page(md_path, relative_path, timestamp), None
+    except Exception as e:
+        return None, str(e)
+
+class SiteNode:
+    """A directory or markdown/text file in the source tree.
+    
+    Built by a single os.scandir pass; file nodes keep the stat result from
+    the scan so nothing is stat'ed twice. Directories that were not descended
+    into have children set to None.
+    """
+    __slots__ = ('name', 'kind', 'path', 'children', 'stat')
+
+    def __init__(self, name, kind, path, children=None, stat=None):
+        self.name = name
+        self.kind = kind
+        self.path = path
+        self.children = children
+        self.stat = stat
+
+    def is_dir(self):
+        return self.kind == 'dir'
+
+class PageRenderer:
+    """Markdown converter and page template, built once and reused for every page.
+    
+    The template is split into its static chunks up front, so assembling a page
+    is a single join instead of a fresh str.format parse.
+    """
+
+    def __init__(self, template, extensions):
+        self.md = markdown.Markdown(extensions=extensions)
+        self.chunks = []
+        self.fields = []
+        
+        # Formatter.parse unescapes '{{'/'}}' in the literal text for us
+        pending = []
+        for literal, field, _, _ in Formatter().parse(template):
+            pending.append(literal)
+            if field is not None:
+                self.chunks.append(''.join(pending))
+                self.fields.append(field)
+                pending = []
+        self.chunks.append(''.join(pending))
+
+    def convert(self, text):
+        """Convert one markdown document, resetting per-document state first"""
+        return self.md.reset().convert(text)
+
+    def render(self, **values):
+        """Fill the pre-split template with the given field values"""
+        parts = [None] * (2 * len(self.fields) + 1)
+        parts[::2] = self.chunks
+        parts[1::2] = [values[field] for field in self.fields]
+        return ''.join(parts)
 
 class FastSiteGenerator:
-    def __init__(self, source_dir=".", output_dir="docs"):
+    def __init__(self, source_dir=".", output_dir="docs", incremental=False, jobs=1,
+                 listing_page_size=DEFAULT_LISTING_PAGE_SIZE, search=True, timestamps='now',
+                 compress_min_size=None):
         self.source_dir = Path(source_dir)
         self.output_dir = Path(output_dir)
         self.markdown_extensions = ['toc', 'tables', 'fenced_code', 'codehilite']
+        self.incremental = incremental
+        self.jobs = max(1, jobs)
+        self.listing_page_size = listing_page_size
+        self.search = search
+        self.search_terms_path = self.output_dir / SEARCH_TERMS_NAME
+        self.search_terms = {}
+        self.timestamps = timestamps
+        self.compress_min_size = compress_min_size
+        self.git_timestamps = {}
+        self.manifest_path = self.output_dir / MANIFEST_NAME
+        self._renderer = None
+        self.manifest = None
         
         # Create output directory
         self.output_dir.mkdir(exist_ok=True)
         
+    def __getstate__(self):
+        # Pool workers build their own renderer on first use and only render pages, so the
+        # per-build bookkeeping (every page's search terms, git times, the manifest) stays here
+        state = self.__dict__.copy()
+        state['_renderer'] = None
+        state['search_terms'] = {}
+        state['git_timestamps'] = {}
+        state['manifest'] = None
+        return state
+
+    def get_renderer(self):
+        """Return this process's PageRenderer, creating it on first use"""
+        if self._renderer is None:
+            self._renderer = PageRenderer(self.get_html_template(), self.markdown_extensions)
+        return self._renderer
+
+    def get_stylesheet(self):
+        """Site-wide CSS, written once as a content-hashed file"""
+        return STYLESHEET
+
+    def stylesheet_name(self):
+        """Content-hashed stylesheet file name, safe to cache forever"""
+        return content_hashed_name("site", self.get_stylesheet(), ".css")
+
+    def search_script_name(self):
+        """Content-hashed name of the search script inside the search directory"""
+        return content_hashed_name("search", SEARCH_JS, ".js")
+
+    def write_stylesheet(self):
+        """Write the shared stylesheet unless this exact version already exists"""
+        css_path = self.output_dir / self.stylesheet_name()
+        if not css_path.exists():
+            write_if_changed(css_path, self.get_stylesheet())
+        return css_path
+
     def get_html_template(self):
         """Simple, responsive HTML template"""
         return '''<!DOCTYPE html>
@@ -27,108 +437,12 @@ class FastSiteGenerator:
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{title}</title>
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{ 
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
-            line-height: 1.6; 
-            color: #333; 
-            background: #fff;
-        }}
-        .container {{ max-width: 1200px; margin: 0 auto; padding: 20px; }}
-        .header {{ 
-            background: #2c3e50; 
-            color: white; 
-            padding: 1rem 0; 
-            position: sticky; 
-            top: 0; 
-            z-index: 100;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        .home-btn {{ 
-            position: fixed; 
-            top: 20px; 
-            right: 20px; 
-            background: #e74c3c; 
-            color: white; 
-            padding: 12px 16px; 
-            border-radius: 50px; 
-            text-decoration: none; 
-            font-weight: bold; 
-            z-index: 1000;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.2);
-            transition: all 0.3s;
-        }}
-        .home-btn:hover {{ background: #c0392b; transform: translateY(-2px); }}
-        .breadcrumb {{ 
-            background: #ecf0f1; 
-            padding: 10px 0; 
-            margin-bottom: 20px; 
-            font-size: 14px;
-        }}
-        .breadcrumb a {{ color: #3498db; text-decoration: none; }}
-        .breadcrumb a:hover {{ text-decoration: underline; }}
-        .content {{ 
-            background: white; 
-            padding: 2rem; 
-            border-radius: 8px; 
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }}
-        .file-list {{ 
-            display: grid; 
-            grid-template-columns: repeat(auto-fill, minmax(300px, 1fr)); 
-            gap: 1rem; 
-            margin: 2rem 0; 
-        }}
-        .file-item {{ 
-            padding: 1rem; 
-            border: 1px solid #ddd; 
-            border-radius: 8px; 
-            background: #f8f9fa;
-            transition: all 0.3s;
-        }}
-        .file-item:hover {{ 
-            transform: translateY(-2px); 
-            box-shadow: 0 4px 12px rgba(0,0,0,0.15); 
-        }}
-        .file-item a {{ 
-            color: #2c3e50; 
-            text-decoration: none; 
-            font-weight: 500; 
-            display: block;
-        }}
-        .file-item a:hover {{ color: #3498db; }}
-        .file-type {{ 
-            font-size: 12px; 
-            color: #7f8c8d; 
-            margin-top: 5px; 
-        }}
-        .tree {{ font-family: monospace; white-space: pre-line; background: #f8f9fa; padding: 1rem; border-radius: 8px; }}
-        pre {{ background: #2c3e50; color: #ecf0f1; padding: 1rem; border-radius: 8px; overflow-x: auto; }}
-        code {{ background: #ecf0f1; padding: 2px 4px; border-radius: 4px; font-size: 0.9em; }}
-        pre code {{ background: none; padding: 0; }}
-        h1, h2, h3, h4, h5, h6 {{ color: #2c3e50; margin: 1.5rem 0 1rem 0; }}
-        h1 {{ border-bottom: 3px solid #3498db; padding-bottom: 10px; }}
-        a {{ color: #3498db; }}
-        a:hover {{ color: #2980b9; }}
-        .footer {{ 
-            text-align: center; 
-            padding: 2rem; 
-            color: #7f8c8d; 
-            border-top: 1px solid #ecf0f1; 
-            margin-top: 3rem; 
-        }}
-        @media (max-width: 768px) {{
-            .container {{ padding: 10px; }}
-            .file-list {{ grid-template-columns: 1fr; }}
-            .content {{ padding: 1rem; }}
-        }}
-    </style>
+    <link rel="stylesheet" href="{root}''' + self.stylesheet_name() + '''">
 </head>
 <body>
     <div class="header">
         <div class="container">
-            <h1>{header_title}</h1>
+            <h1>{header_title}</h1>''' + (SEARCH_BOX if self.search else '') + '''
         </div>
     </div>
     <a href="/" class="home-btn">🏠 Home</a>
@@ -142,10 +456,16 @@ class FastSiteGenerator:
         <div class="footer">
             Generated on {timestamp}
         </div>
-    </div>
+    </div>''' + (f'\n    <script src="{{root}}{SEARCH_DIR}/{self.search_script_name()}" defer></script>' if self.search else '') + '''
 </body>
 </html>'''
 
+    def root_prefix(self, relative_dir):
+        """Relative path from a directory back to the site root, so shared assets load
+        whether the site is served from / or from a project prefix like /yourrepo/"""
+        parts = relative_dir.parts if relative_dir != Path('.') else ()
+        return "../" * len(parts) or "./"
+
     def create_breadcrumb(self, path):
         """Create breadcrumb navigation"""
         parts = path.parts if path != Path('.') else []
@@ -160,150 +480,1001 @@ class FastSiteGenerator:
 
     def process_markdown(self, md_path, relative_path):
         """Convert markdown to HTML"""
+        return self.render_page(md_path, relative_path)[0]
+
+    def render_page(self, md_path, relative_path, timestamp=None):
+        """Convert markdown to a full HTML page plus its search terms (None if search is off)"""
         with open(md_path, 'r', encoding='utf-8', errors='ignore') as f:
             content = f.read()
         
-        md = markdown.Markdown(extensions=self.markdown_extensions)
-        html_content = md.convert(content)
+        renderer = self.get_renderer()
+        html_content = renderer.convert(content)
         
         # Create breadcrumb
         breadcrumb = self.create_breadcrumb(relative_path.parent)
         
         # Generate HTML
-        html = self.get_html_template().format(
+        html = renderer.render(
             title=md_path.stem,
             header_title=md_path.stem,
             breadcrumb=breadcrumb,
+            root=self.root_prefix(relative_path.parent),
             content=html_content,
-            timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            timestamp=self.format_timestamp(timestamp)
         )
         
-        return html
+        terms = self.extract_terms(md_path.stem, html_content) if self.search else None
+        return html, terms
 
-    def create_directory_listing(self, dir_path, relative_path):
-        """Create directory listing page"""
-        files = []
-        dirs = []
+    def extract_terms(self, title, html_content):
+        """Unique lower-cased words of a page, taken from the already-converted HTML"""
+        text = unescape(TAG_RE.sub(' ', html_content))
+        return sorted({term for term in TERM_RE.findall(f"{title} {text}".lower()) if len(term) <= MAX_TERM_LENGTH})
+
+    def shard_key(self, term):
+        """Search index shard a term lives in: its first two characters"""
+        return re.sub(r'[^a-z0-9]', '_', term[:2])
+
+    def load_search_terms(self):
+        """Per-page search terms from the previous build, keyed like the manifest"""
+        try:
+            with open(self.search_terms_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record_search_terms(self, job, terms):
+        if terms is not None:
+            self.search_terms[job['key']] = [job['record']['output'], job['rel_file_path'].stem, terms]
+
+    def write_search_index(self, manifest):
+        """Write the sharded inverted index and the search script.
+        
+        pages.json maps page id -> [url relative to the site root, title]; each <shard>.json maps
+        term -> delta-encoded page ids, so the browser only fetches the
+        shards for the terms it is looking up.
+        """
+        self.search_terms = {key: self.search_terms[key] for key in sorted(manifest['pages'])
+                             if key in self.search_terms}
+        search_dir = self.output_dir / SEARCH_DIR
+        search_dir.mkdir(exist_ok=True)
+        
+        pages = []
+        shards = {}
+        for page_id, (url, title, terms) in enumerate(self.search_terms.values()):
+            pages.append([url.lstrip('/'), title])  # relative to the site root; older builds stored "/url"
+            for term in terms:
+                shards.setdefault(self.shard_key(term), {}).setdefault(term, []).append(page_id)
+        
+        written = {'pages.json', self.search_script_name()}
+        write_if_changed(search_dir / 'pages.json', json.dumps(pages, separators=(',', ':'), ensure_ascii=False))
+        for key, postings in shards.items():
+            for term, ids in postings.items():
+                postings[term] = [ids[0]] + [b - a for a, b in zip(ids, ids[1:])]
+            write_if_changed(search_dir / f"{key}.json", json.dumps(postings, separators=(',', ':'), ensure_ascii=False))
+            written.add(f"{key}.json")
+        write_if_changed(search_dir / self.search_script_name(), SEARCH_JS)
+        
+        owned = {record['output'] for record in manifest['pages'].values()} | self.listing_outputs(manifest)
+        for stale in search_dir.iterdir():
+            if (stale.name not in written and SEARCH_OUTPUT_RE.fullmatch(stale.name)
+                    and stale.relative_to(self.output_dir).as_posix() not in owned):
+                unlink_output(stale)
         
-        for item in sorted(dir_path.iterdir()):
-            if item.name.startswith('.'):
+        with open(self.search_terms_path, 'w', encoding='utf-8') as f:
+            json.dump(self.search_terms, f, separators=(',', ':'), ensure_ascii=False)
+        print(f"🔍 Search index: {len(pages)} pages, {len(shards)} shards")
+
+    def scan_tree(self, dir_path, relative_path=Path('.'), recursive=True):
+        """Build the SiteNode tree for a directory with one os.scandir per directory.
+        
+        Hidden entries are dropped. Directories that are not descended into
+        (the output dir, symlinks, or everything below when recursive=False)
+        are kept as unscanned nodes so they still show up in their parent's
+        listing.
+        """
+        node = SiteNode(dir_path.name, 'dir', dir_path, children=[])
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"⚠️  Error scanning {relative_path}: {e}")
+            return node
+        
+        for entry in entries:
+            if entry.name.startswith('.'):
                 continue
-                
-            rel_item_path = relative_path / item.name
             
+            entry_path = Path(entry.path)
+            try:
+                if entry.is_dir():
+                    rel_entry_path = relative_path / entry.name
+                    if recursive and not entry.is_symlink() and not self.is_skipped(rel_entry_path):
+                        node.children.append(self.scan_tree(entry_path, rel_entry_path))
+                    else:
+                        node.children.append(SiteNode(entry.name, 'dir', entry_path))
+                elif entry_path.suffix.lower() in ('.md', '.txt'):
+                    node.children.append(SiteNode(entry.name, 'file', entry_path, stat=entry.stat()))
+            except OSError as e:
+                print(f"⚠️  Error scanning {relative_path / entry.name}: {e}")
+        
+        return node
+
+    def iter_directories(self, node, relative_path=Path('.')):
+        """Yield (node, relative_path) for every published directory, parents first"""
+        stack = [(node, relative_path)]
+        while stack:
+            node, relative_path = stack.pop()
+            yield node, relative_path
+            stack.extend(reversed([(child, relative_path / child.name) for child in node.children
+                                   if child.is_dir() and child.children is not None]))
+
+    def collect_listing_entries(self, node, relative_path):
+        """Collect the directory and file entries shown on a listing page"""
+        files = []
+        dirs = []
+        # Plain string joins: Path arithmetic per entry dominates on huge directories
+        prefix = "/" if relative_path == Path('.') else f"/{relative_path.as_posix()}/"
+        
+        for item in node.children:
             if item.is_dir():
                 dirs.append({
                     'name': item.name,
-                    'path': f"/{rel_item_path}/",
+                    'path': f"{prefix}{item.name}/",
                     'type': 'Directory'
                 })
-            elif item.suffix.lower() in ['.md', '.txt']:
+            else:
+                suffix = os.path.splitext(item.name)[1]
                 files.append({
                     'name': item.name,
-                    'path': f"/{rel_item_path.with_suffix('.html')}",
-                    'type': f'{item.suffix.upper()} File'
+                    'path': f"{prefix}{self.page_output_name(item.name)}",
+                    'type': f'{suffix.upper()} File'
                 })
         
+        return dirs, files
+
+    def listing_page_name(self, page):
+        """File name of the given (1-based) listing page"""
+        return "index.html" if page == 1 else f"index-{page}.html"
+
+    def page_output_name(self, name):
+        """Output file name of a page; listings own index.html and index-N.html, so a page
+        that would land on one keeps its source extension (index.md -> index.md.html)"""
+        stem = os.path.splitext(name)[0]
+        return f"{name}.html" if LISTING_STEM_RE.fullmatch(stem) else f"{stem}.html"
+
+    def listing_outputs(self, manifest):
+        """Output paths owned by the listings recorded in the manifest"""
+        owned = set()
+        for dir_key, record in manifest['listings'].items():
+            prefix = "" if dir_key == '.' else f"{dir_key}/"
+            owned.update(f"{prefix}{self.listing_page_name(page)}" for page in range(1, record['pages'] + 1))
+        return owned
+
+    def create_pagination(self, page, page_count):
+        """Previous/next links between the pages of a long listing"""
+        parts = ['<div class="pagination">']
+        if page > 1:
+            parts.append(f'<a href="{self.listing_page_name(page - 1)}">← Previous</a>')
+        parts.append(f'<span>Page {page} of {page_count}</span>')
+        if page < page_count:
+            parts.append(f'<a href="{self.listing_page_name(page + 1)}">Next →</a>')
+        parts.append('</div>')
+        return ''.join(parts)
+
+    def create_directory_listing(self, node, relative_path, entries=None, page=1, page_count=1, timestamp=None):
+        """Create one directory listing page.
+        
+        entries holds the (dirs, files) shown on this page; by default the
+        whole directory.
+        """
+        dirs, files = entries or self.collect_listing_entries(node, relative_path)
+        
         # Create content
-        content = f"<h1>{relative_path.name if relative_path.name else 'Documentation'}</h1>"
+        parts = [f"<h1>{relative_path.name if relative_path.name else 'Documentation'}</h1>"]
         
         if dirs or files:
-            content += '<div class="file-list">'
+            parts.append('<div class="file-list">')
             
-            # Directories first
-            for dir_info in dirs:
-                content += f'''
-                <div class="file-item">
-                    <a href="{dir_info['path']}">{dir_info['name']}/</a>
-                    <div class="file-type">{dir_info['type']}</div>
-                </div>'''
+            # Directories first, then files
+            parts.extend(LISTING_DIR_ITEM.format(**dir_info) for dir_info in dirs)
+            parts.extend(LISTING_FILE_ITEM.format(**file_info) for file_info in files)
             
-            # Then files
-            for file_info in files:
-                content += f'''
-                <div class="file-item">
-                    <a href="{file_info['path']}">{file_info['name']}</a>
-                    <div class="file-type">{file_info['type']}</div>
-                </div>'''
-            
-            content += '</div>'
+            parts.append('</div>')
         else:
-            content += '<p>No files found in this directory.</p>'
+            parts.append('<p>No files found in this directory.</p>')
+        
+        if page_count > 1:
+            parts.append(self.create_pagination(page, page_count))
         
         breadcrumb = self.create_breadcrumb(relative_path)
+        title = relative_path.name if relative_path.name else "Home"
         
-        html = self.get_html_template().format(
-            title=relative_path.name if relative_path.name else "Home",
+        html = self.get_renderer().render(
+            title=title if page == 1 else f"{title} (page {page})",
             header_title=relative_path.name if relative_path.name else "Documentation Home",
             breadcrumb=breadcrumb,
-            content=content,
-            timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            root=self.root_prefix(relative_path),
+            content=''.join(parts),
+            timestamp=self.format_timestamp(timestamp)
         )
         
         return html
 
+    def iter_listing_pages(self, node, relative_path, entries, timestamp=None):
+        """Yield (file name, html) for each page of a directory listing.
+        
+        Pages are produced one at a time so a huge directory never has to be
+        held in memory as a single document.
+        """
+        dirs, files = entries
+        total = len(dirs) + len(files)
+        page_size = self.listing_page_size if self.listing_page_size > 0 else max(total, 1)
+        page_count = max(1, -(-total // page_size))
+        
+        for page in range(1, page_count + 1):
+            start, end = (page - 1) * page_size, page * page_size
+            page_entries = (dirs[start:end], files[max(0, start - len(dirs)):max(0, end - len(dirs))])
+            yield self.listing_page_name(page), self.create_directory_listing(
+                node, relative_path, page_entries, page, page_count, timestamp)
+
+    def renderer_fingerprint(self):
+        """Hash of everything besides the source that shapes a rendered page"""
+        key = json.dumps([self.get_html_template(), self.markdown_extensions, markdown.__version__, self.timestamps])
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def load_manifest(self):
+        """Load the previous build manifest, or None if it is missing or stale"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if manifest.get('version') != MANIFEST_VERSION:
+            return None
+        if manifest.get('renderer') != self.renderer_fingerprint():
+            print("♻️  Templates or extensions changed, doing a full rebuild")
+            return None
+        return manifest
+
+    def save_manifest(self, manifest):
+        """Atomically write the build manifest"""
+        text = json.dumps(manifest, indent=1, sort_keys=True)
+        try:
+            if self.manifest_path.read_text(encoding='utf-8') == text:
+                return
+        except OSError:
+            pass
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, self.manifest_path)
+
+    def format_timestamp(self, timestamp=None):
+        """Footer timestamp: wall-clock time, or a fixed source time rendered in UTC"""
+        if timestamp is None:
+            return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+    def load_git_timestamps(self):
+        """Last commit time of every tracked file under the source dir, from one git log"""
+        try:
+            log = subprocess.run(
+                ['git', 'log', '--format=%x00%ct', '--name-only', '--relative', '-z'],
+                cwd=self.source_dir, capture_output=True, text=True, check=True, encoding='utf-8',
+                errors='surrogateescape'
+            ).stdout
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"⚠️  Could not read git history, falling back to mtimes: {e}")
+            return {}
+        
+        timestamps = {}
+        commit_time = None
+        # -z keeps paths unquoted: each commit is "\0<time>\0\n<path>\0<path>\0...". Paths are never
+        # empty, so an empty field means a commit time follows
+        fields = iter(log.split('\0'))
+        for field in fields:
+            if not field:
+                commit_time = int(next(fields, None) or 0)
+                first_path = True
+                continue
+            if first_path:
+                field, first_path = field[1:], False  # drop the newline after the commit time
+            # git log is newest first, so the first time a path shows up is its latest commit
+            if field not in timestamps:
+                timestamps[field] = commit_time
+        return timestamps
+
+    def listing_timestamp(self, listing_times, relative_path):
+        """Timestamp for a listing: its newest page, else the newest page on the site"""
+        if self.timestamps == 'now':
+            return None
+        return listing_times.get(relative_path.as_posix(), listing_times.get('.', 0))
+
+    def source_timestamp(self, page_key, record):
+        """Timestamp shown on a page in reproducible mode, None for wall-clock time"""
+        if self.timestamps == 'now':
+            return None
+        if self.timestamps == 'git' and page_key in self.git_timestamps:
+            return self.git_timestamps[page_key]
+        return record['mtime'] // 1_000_000_000
+
+    def listing_timestamps(self, manifest):
+        """Newest page timestamp under each directory, used for listing footers"""
+        timestamps = {}
+        if self.timestamps == 'now':
+            return timestamps
+        
+        for page_key, record in manifest['pages'].items():
+            timestamp = record.get('timestamp')
+            if timestamp is None:
+                continue
+            parts = page_key.split('/')[:-1]
+            for depth in range(len(parts) + 1):
+                dir_key = '/'.join(parts[:depth]) or '.'
+                if timestamp > timestamps.get(dir_key, -1):
+                    timestamps[dir_key] = timestamp
+        return timestamps
+
+    def source_record(self, file_path, previous=None, stat=None):
+        """Build the manifest record for a source file.
+        
+        The content hash is only recomputed when mtime or size moved, so an
+        unchanged tree costs one stat per page.
+        """
+        stat = stat or file_path.stat()
+        if previous and previous['hash'] and previous['mtime'] == stat.st_mtime_ns and previous['size'] == stat.st_size:
+            content_hash = previous['hash']
+        else:
+            with open(file_path, 'rb') as f:
+                content_hash = hashlib.sha256(f.read()).hexdigest()
+        
+        return {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': content_hash}
+
+    def listing_signature(self, entries):
+        """Hash of a listing's entries, used to skip unchanged index pages"""
+        return hashlib.sha256(json.dumps(entries).encode('utf-8')).hexdigest()
+
+    def remove_stale_outputs(self, manifest, seen_pages, seen_dirs):
+        """Delete outputs whose sources disappeared since the last build"""
+        # Listings are written before this runs; never delete what a live one owns
+        live_outputs = {manifest['pages'][page]['output'] for page in seen_pages}
+        live_outputs |= self.listing_outputs({'listings': {d: r for d, r in manifest['listings'].items() if d in seen_dirs}})
+        
+        for page in sorted(set(manifest['pages']) - seen_pages):
+            output = manifest['pages'].pop(page)['output']
+            if output not in live_outputs:
+                unlink_output(self.output_dir / output)
+                print(f"🗑️  {page}")
+        
+        # Deepest directories first so parents are empty by the time we reach them
+        removed_dirs = sorted(set(manifest['listings']) - seen_dirs, key=lambda d: d.count('/'), reverse=True)
+        for rel_dir in removed_dirs:
+            self.remove_listing(Path(rel_dir), manifest['listings'].pop(rel_dir))
+            print(f"🗑️  {rel_dir}/")
+
+    def render_pages(self, page_jobs):
+        """Render pages, yielding (job, (html, terms), error) in the order they were queued.
+        
+        With jobs > 1 the markdown conversion runs in a process pool; results
+        still come back in submission order so output and logs are deterministic.
+        """
+        paths = [(job['file_path'], job['rel_file_path'], job['record']['timestamp']) for job in page_jobs]
+        
+        if self.jobs == 1 or len(page_jobs) < 2:
+            _init_worker(self)
+            yield from ((job, *_render_page_worker(p)) for job, p in zip(page_jobs, paths))
+            return
+        
+        chunksize = max(1, len(page_jobs) // (self.jobs * 8))
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker, initargs=(self,)) as executor:
+            yield from ((job, *result) for job, result in zip(page_jobs, executor.map(_render_page_worker, paths, chunksize=chunksize)))
+
+    def is_skipped(self, relative_path):
+        """Hidden paths and the output directory itself are never published"""
+        return any(part.startswith('.') or part == self.output_dir.name for part in relative_path.parts)
+
+    def queue_page(self, manifest, file_path, rel_file_path, stat=None):
+        """Return a render job for a page, or None if its output is already current"""
+        page_key = rel_file_path.as_posix()
+        output_file = self.output_dir / rel_file_path.parent / self.page_output_name(rel_file_path.name)
+        previous = manifest['pages'].get(page_key)
+        
+        record = self.source_record(file_path, previous, stat)
+        record['output'] = output_file.relative_to(self.output_dir).as_posix()
+        record['timestamp'] = self.source_timestamp(page_key, record)
+        
+        if (previous and previous['hash'] == record['hash'] and previous.get('timestamp') == record['timestamp']
+                and output_file.exists()):
+            manifest['pages'][page_key] = record
+            return None
+        
+        return {'key': page_key, 'file_path': file_path, 'rel_file_path': rel_file_path,
+                'output_file': output_file, 'record': record, 'previous': previous}
+
+    def write_page(self, manifest, job, html_content):
+        """Write a rendered page and record it in the manifest; False if the bytes were unchanged"""
+        manifest['pages'][job['key']] = job['record']
+        return write_if_changed(job['output_file'], html_content)
+
+    def write_listing(self, manifest, node, relative_path, timestamp=None):
+        """Write a directory's listing pages if its entries changed; True if any bytes changed"""
+        dir_key = relative_path.as_posix()
+        entries = self.collect_listing_entries(node, relative_path)
+        signature = self.listing_signature([entries, self.listing_page_size, timestamp])
+        output_dir_path = self.output_dir / relative_path
+        previous = manifest['listings'].get(dir_key)
+        
+        if previous and previous['signature'] == signature and (output_dir_path / "index.html").exists():
+            return False
+        
+        page_count = 0
+        changed = False
+        pages = self.iter_listing_pages(node, relative_path, entries, timestamp)
+        for page_count, (page_name, dir_html) in enumerate(pages, 1):
+            changed |= write_if_changed(output_dir_path / page_name, dir_html)
+        
+        # Drop trailing pages left over from a longer listing
+        for page in range(page_count + 1, (previous or {}).get('pages', 0) + 1):
+            unlink_output(output_dir_path / self.listing_page_name(page))
+            changed = True
+        
+        manifest['listings'][dir_key] = {'signature': signature, 'pages': page_count}
+        return changed
+
+    def remove_listing(self, relative_path, record):
+        """Delete a vanished directory's listing pages, and the directory if now empty"""
+        output_dir_path = self.output_dir / relative_path
+        for page in range(1, record['pages'] + 1):
+            unlink_output(output_dir_path / self.listing_page_name(page))
+        try:
+            output_dir_path.rmdir()
+        except OSError:
+            pass
+
+    def compress_outputs(self, min_size=DEFAULT_COMPRESS_MIN_SIZE):
+        """Post-render stage: pre-compressed twins for every HTML/CSS/JS/JSON output.
+        
+        zlib and brotli release the GIL, so a thread pool keeps every core busy.
+        Twins whose source disappeared are removed.
+        """
+        targets = []
+        for root, dirs, files in os.walk(self.output_dir):
+            root_path = Path(root)
+            for name in files:
+                path = root_path / name
+                if name.endswith(COMPRESSED_SUFFIXES):
+                    if not path.with_suffix('').exists():
+                        path.unlink()
+                elif name.endswith(COMPRESSIBLE_SUFFIXES) and not name.startswith('.'):
+                    targets.append(path)
+        
+        workers = self.jobs if self.jobs > 1 else os.cpu_count()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            written = sum(executor.map(lambda path: compress_file(path, min_size), targets))
+        
+        formats = "gzip + brotli" if brotli is not None else "gzip (pip install brotli for .br)"
+        print(f"🗜️  {written} compressed twins written for {len(targets)} files, {formats}")
+
     def generate_site(self):
         """Generate the complete static site"""
         print("🚀 Starting fast site generation...")
         
-        # Clean output directory
-        if self.output_dir.exists():
-            shutil.rmtree(self.output_dir)
-        self.output_dir.mkdir()
+        reproducible = self.timestamps != 'now'
+        manifest = self.load_manifest() if self.incremental or reproducible else None
+        if manifest is None:
+            # Clean output directory
+            if self.output_dir.exists():
+                shutil.rmtree(self.output_dir)
+            self.output_dir.mkdir()
+            manifest = {'version': MANIFEST_VERSION, 'renderer': self.renderer_fingerprint(),
+                        'pages': {}, 'listings': {}}
+        elif not self.incremental:
+            # Reproducible full build: re-render everything over the old output,
+            # so files whose bytes did not change are never rewritten
+            for record in manifest['pages'].values():
+                record['hash'] = None
+            for record in manifest['listings'].values():
+                record['signature'] = None
+            print("♻️  Full build over the existing output, unchanged files are left untouched")
+        else:
+            print("⚡ Incremental build, only changed pages are rendered")
+        self.search_terms = self.load_search_terms() if self.search and self.incremental else {}
+        self.git_timestamps = self.load_git_timestamps() if self.timestamps == 'git' else {}
         
         # Create .nojekyll file for GitHub Pages
         (self.output_dir / '.nojekyll').touch()
+        self.write_stylesheet()
         
-        # Process all directories and files
-        for root, dirs, files in os.walk(self.source_dir):
-            root_path = Path(root)
-            relative_path = root_path.relative_to(self.source_dir)
-            
-            # Skip hidden directories and output directory
-            if any(part.startswith('.') or part == self.output_dir.name for part in relative_path.parts):
-                continue
-                
+        seen_pages = set()
+        seen_dirs = set()
+        page_jobs = []
+        listing_nodes = []
+        skipped = 0
+        identical = 0
+        
+        # One scan of the source tree feeds both page rendering and listings
+        site = self.scan_tree(self.source_dir)
+        
+        for node, relative_path in self.iter_directories(site):
             output_dir_path = self.output_dir / relative_path
             output_dir_path.mkdir(parents=True, exist_ok=True)
             
-            # Process markdown and text files
-            for file in files:
-                if file.startswith('.'):
+            # Queue markdown and text files for rendering
+            for child in node.children:
+                if child.is_dir() or not child.name.endswith(('.md', '.txt')):
                     continue
-                    
-                file_path = root_path / file
-                rel_file_path = relative_path / file
                 
-                if file.endswith(('.md', '.txt')):
-                    try:
-                        html_content = self.process_markdown(file_path, rel_file_path)
-                        output_file = output_dir_path / f"{Path(file).stem}.html"
-                        
-                        with open(output_file, 'w', encoding='utf-8') as f:
-                            f.write(html_content)
-                        
-                        print(f"✅ {rel_file_path}")
-                    except Exception as e:
-                        print(f"⚠️  Error processing {rel_file_path}: {e}")
+                rel_file_path = relative_path / child.name
+                try:
+                    job = self.queue_page(manifest, child.path, rel_file_path, child.stat)
+                except OSError as e:
+                    print(f"⚠️  Error processing {rel_file_path}: {e}")
+                    continue
+                
+                if job is None:
+                    seen_pages.add(rel_file_path.as_posix())
+                    skipped += 1
+                else:
+                    page_jobs.append(job)
             
-            # Create directory listing
+            seen_dirs.add(relative_path.as_posix())
+            listing_nodes.append((node, relative_path))
+        
+        for job, result, error in self.render_pages(page_jobs):
+            rel_file_path = job['rel_file_path']
             try:
-                dir_html = self.create_directory_listing(root_path, relative_path)
-                index_file = output_dir_path / "index.html"
-                
-                with open(index_file, 'w', encoding='utf-8') as f:
-                    f.write(dir_html)
+                if error is not None:
+                    raise RuntimeError(error)
                 
-                print(f"📁 {relative_path}/")
+                html_content, terms = result
+                if not self.write_page(manifest, job, html_content):
+                    identical += 1
+                self.record_search_terms(job, terms)
+                seen_pages.add(job['key'])
+                print(f"✅ {rel_file_path}")
+            except Exception as e:
+                # Keep the previous output around; the stale hash forces a retry next run
+                if job['previous']:
+                    seen_pages.add(job['key'])
+                print(f"⚠️  Error processing {rel_file_path}: {e}")
+        
+        # Listings go last: in reproducible mode they carry their newest page's timestamp
+        listing_times = self.listing_timestamps(manifest)
+        for node, relative_path in listing_nodes:
+            try:
+                if self.write_listing(manifest, node, relative_path, self.listing_timestamp(listing_times, relative_path)):
+                    print(f"📁 {relative_path}/")
             except Exception as e:
                 print(f"⚠️  Error creating directory listing for {relative_path}: {e}")
         
+        self.remove_stale_outputs(manifest, seen_pages, seen_dirs)
+        self.save_manifest(manifest)
+        self.manifest = manifest
+        
+        if self.search and (page_jobs or not (self.output_dir / SEARCH_DIR).exists()
+                            or self.search_terms.keys() != manifest['pages'].keys()):
+            self.write_search_index(manifest)
+        
+        if self.compress_min_size is not None:
+            self.compress_outputs(self.compress_min_size)
+        
+        if skipped:
+            print(f"\n⏭️  {skipped} unchanged pages skipped")
+        if identical:
+            print(f"🟰 {identical} re-rendered pages were byte-identical and left untouched")
         print(f"\n🎉 Site generated successfully in '{self.output_dir}'!")
         print(f"📊 Ready for GitHub Pages deployment")
 
+    def rebuild_paths(self, changed_paths):
+        """Re-render only the pages and listings touched by the given source paths.
+        
+        Used by the dev server after the initial build. Returns the number of
+        outputs that were written or removed.
+        """
+        manifest = self.manifest
+        touched_dirs = set()
+        updated = 0
+        
+        for path in changed_paths:
+            path = Path(path)
+            try:
+                rel_path = path.relative_to(self.source_dir)
+            except ValueError:
+                continue
+            if self.is_skipped(rel_path) or path.suffix not in ('.md', '.txt'):
+                continue
+            
+            touched_dirs.add(rel_path.parent)
+            page_key = rel_path.as_posix()
+            try:
+                if not path.is_file():
+                    record = manifest['pages'].pop(page_key, None)
+                    if record:
+                        if record['output'] not in self.listing_outputs(manifest):
+                            unlink_output(self.output_dir / record['output'])
+                        print(f"🗑️  {rel_path}")
+                        updated += 1
+                    continue
+                
+                job = self.queue_page(manifest, path, rel_path)
+                if job is None:
+                    continue
+                job['output_file'].parent.mkdir(parents=True, exist_ok=True)
+                html_content, terms = self.render_page(path, rel_path, job['record']['timestamp'])
+                self.write_page(manifest, job, html_content)
+                self.record_search_terms(job, terms)
+                print(f"✅ {rel_path}")
+                updated += 1
+            except Exception as e:
+                print(f"⚠️  Error processing {rel_path}: {e}")
+        
+        # New or vanished directories also change their parent's listing
+        for relative_path in list(touched_dirs):
+            while relative_path != Path('.') and (
+                    not (self.source_dir / relative_path).is_dir()
+                    or relative_path.as_posix() not in manifest['listings']):
+                relative_path = relative_path.parent
+                touched_dirs.add(relative_path)
+        
+        listing_times = self.listing_timestamps(manifest)
+        for relative_path in sorted(touched_dirs, key=lambda d: len(d.parts), reverse=True):
+            root_path = self.source_dir / relative_path
+            if not root_path.is_dir():
+                record = manifest['listings'].pop(relative_path.as_posix(), None)
+                if record:
+                    self.remove_listing(relative_path, record)
+                    print(f"🗑️  {relative_path}/")
+                    updated += 1
+                continue
+            try:
+                node = self.scan_tree(root_path, relative_path, recursive=False)
+                if self.write_listing(manifest, node, relative_path, self.listing_timestamp(listing_times, relative_path)):
+                    print(f"📁 {relative_path}/")
+                    updated += 1
+            except Exception as e:
+                print(f"⚠️  Error creating directory listing for {relative_path}: {e}")
+        
+        if updated:
+            self.save_manifest(manifest)
+        return updated
+
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_SCRIPT = (b'<script>new EventSource("' + LIVE_RELOAD_PATH.encode() +
+                      b'").onmessage = function () { location.reload(); };</script>')
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    """Static file handler that injects a reload hook and streams build events"""
+
+    def do_GET(self):
+        if self.path == LIVE_RELOAD_PATH:
+            return self.stream_reload_events()
+        
+        file_path = Path(self.translate_path(self.path))
+        if file_path.is_dir():
+            file_path = file_path / "index.html"
+        if file_path.suffix != '.html' or not file_path.is_file() or not self.path.split('?')[0].endswith(('/', '.html')):
+            return super().do_GET()
+        
+        body = file_path.read_bytes().replace(b'</body>', LIVE_RELOAD_SCRIPT + b'</body>', 1)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reload_events(self):
+        """Server-sent events: one 'reload' message per finished rebuild"""
+        dev_server = self.server.dev_server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        
+        seen_version = dev_server.version
+        try:
+            while True:
+                with dev_server.changed:
+                    dev_server.changed.wait_for(lambda: dev_server.version != seen_version, timeout=15)
+                if dev_server.version != seen_version:
+                    seen_version = dev_server.version
+                    self.wfile.write(b"data: reload\n\n")
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+class SourceChangeHandler(FileSystemEventHandler):
+    """watchdog handler that forwards changed source paths to the rebuild queue"""
+
+    def __init__(self, events):
+        self.events = events
+
+    def on_any_event(self, event):
+        if event.event_type in ('opened', 'closed_no_write'):
+            return
+        # A directory's own 'modified' event just mirrors the file events inside it
+        if event.is_directory and event.event_type == 'modified':
+            return
+        self.events.put((event.src_path, event.is_directory))
+        if getattr(event, 'dest_path', None):
+            self.events.put((event.dest_path, event.is_directory))
+
+class DevServer:
+    """Build once, then watch the sources, rebuild what changed and live-reload browsers"""
+
+    def __init__(self, generator, host="127.0.0.1", port=8000, poll_interval=0.5):
+        self.generator = generator
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.events = queue.Queue()
+        self.version = 0
+        self.changed = threading.Condition()
+
+    def notify_reload(self):
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+
+    def is_source_path(self, path):
+        """True for paths inside the source tree that would be published"""
+        try:
+            rel_path = Path(path).relative_to(self.generator.source_dir)
+        except ValueError:
+            return False
+        return not self.generator.is_skipped(rel_path)
+
+    def snapshot(self):
+        """mtime/size of every publishable source file, for the polling watcher"""
+        generator = self.generator
+        state = {}
+        for node, _ in generator.iter_directories(generator.scan_tree(generator.source_dir)):
+            for child in node.children:
+                if not child.is_dir():
+                    state[str(child.path)] = (child.stat.st_mtime_ns, child.stat.st_size)
+        return state
+
+    def poll_sources(self, stop):
+        """Fallback watcher used when watchdog is not installed"""
+        previous = self.snapshot()
+        while not stop.wait(self.poll_interval):
+            current = self.snapshot()
+            for path in previous.keys() | current.keys():
+                if previous.get(path) != current.get(path):
+                    self.events.put((path, False))
+            previous = current
+
+    def start_watcher(self, stop):
+        if Observer is not None:
+            observer = Observer()
+            observer.schedule(SourceChangeHandler(self.events), str(self.generator.source_dir), recursive=True)
+            observer.daemon = True
+            observer.start()
+            print("👀 Watching sources with watchdog")
+            return observer
+        
+        threading.Thread(target=self.poll_sources, args=(stop,), daemon=True).start()
+        print(f"👀 Watching sources by polling every {self.poll_interval}s (pip install watchdog for instant updates)")
+        return None
+
+    def next_batch(self):
+        """Block for the next change, then drain the burst an editor save produces"""
+        batch = [self.events.get()]
+        while True:
+            try:
+                batch.append(self.events.get(timeout=0.02))
+            except queue.Empty:
+                return batch
+
+    def serve_forever(self):
+        generator = self.generator
+        generator.incremental = True
+        generator.generate_site()
+        
+        httpd = ThreadingHTTPServer((self.host, self.port),
+                                    lambda *args: LiveReloadHandler(*args, directory=str(generator.output_dir)))
+        httpd.dev_server = self
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        print(f"\n🌐 Serving on http://{self.host}:{self.port}/ (Ctrl+C to stop)")
+        
+        stop = threading.Event()
+        observer = self.start_watcher(stop)
+        try:
+            while True:
+                batch = self.next_batch()
+                start = time.perf_counter()
+                paths = {path for path, _ in batch}
+                
+                if any(is_dir and self.is_source_path(path) for path, is_dir in batch):
+                    # Whole directories moved or vanished: let the manifest sort it out
+                    generator.generate_site()
+                    updated = 1
+                else:
+                    updated = generator.rebuild_paths(paths)
+                
+                if updated:
+                    self.notify_reload()
+                    print(f"🔄 Rebuilt in {(time.perf_counter() - start) * 1000:.0f} ms")
+                    # The search index is site-wide, so refresh it after the page is already live
+                    if generator.search:
+                        generator.write_search_index(generator.manifest)
+        except KeyboardInterrupt:
+            print("\n👋 Stopping dev server")
+        finally:
+            stop.set()
+            if observer is not None:
+                observer.stop()
+            httpd.shutdown()
+
+BENCHMARK_SAMPLE = """# Sample page
+
+Some *emphasis*, a [link](https://example.com) and `inline code`.
+
+## Table
+
+| Name | Value |
+|------|-------|
+| a    | 1     |
+| b    | 2     |
+
+```python
+def hello(name):
+    return f"Hello {name}"
+```
+"""
+
+def benchmark_rendering(generator, sample_limit=50, rounds=5):
+    """Compare per-page render cost of the old per-page setup against PageRenderer"""
+    samples = []
+    for path in sorted(generator.source_dir.rglob('*.md'))[:sample_limit]:
+        if generator.output_dir.name not in path.parts:
+            samples.append(path.read_text(encoding='utf-8', errors='ignore'))
+    samples = samples or [BENCHMARK_SAMPLE]
+    template = generator.get_html_template()
+    fields = dict(title="t", header_title="t", breadcrumb="", root="./", timestamp="")
+    
+    def legacy(text):
+        md = markdown.Markdown(extensions=generator.markdown_extensions)
+        return template.format(content=md.convert(text), **fields)
+    
+    renderer = generator.get_renderer()
+    def reused(text):
+        return renderer.render(content=renderer.convert(text), **fields)
+    
+    print(f"⏱️  Rendering {len(samples)} pages x {rounds} rounds")
+    results = {}
+    for name, render in (("per-page setup", legacy), ("PageRenderer", reused)):
+        render(samples[0])  # warm up imports and Pygments lexers
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for text in samples:
+                render(text)
+        results[name] = (time.perf_counter() - start) / (rounds * len(samples))
+        print(f"   {name:<15} {results[name] * 1000:8.3f} ms/page")
+    
+    print(f"   speedup         {results['per-page setup'] / results['PageRenderer']:8.2f}x")
+    return results
+
+def check_listing_ownership():
+    """Regression check: a page named index.md must never clobber or delete its directory's
+    listing, and incremental builds must match a full build. Returns True when it passes."""
+    def html_outputs(output_dir):
+        return {path.relative_to(output_dir).as_posix(): path.read_bytes()
+                for path in sorted(output_dir.rglob('*.html'))}
+    
+    def build(source_dir, output_dir, incremental):
+        FastSiteGenerator(source_dir, output_dir, incremental=incremental, search=False,
+                          timestamps='mtime').generate_site()
+        return html_outputs(output_dir)
+    
+    failures = []
+    with tempfile.TemporaryDirectory() as scratch:
+        source_dir = Path(scratch) / "src"
+        (source_dir / "sub").mkdir(parents=True)
+        (source_dir / "index.md").write_text("# Home\n", encoding='utf-8')
+        (source_dir / "page.md").write_text("# Page\n", encoding='utf-8')
+        (source_dir / "sub" / "index.txt").write_text("nested\n", encoding='utf-8')
+        site_dir = Path(scratch) / "site"
+        build(source_dir, site_dir, incremental=False)
+        
+        for case, change in (("edit index.md", lambda: (source_dir / "index.md").write_text("# Home v2\n", encoding='utf-8')),
+                             ("delete index.md", lambda: (source_dir / "index.md").unlink())):
+            change()
+            incremental = build(source_dir, site_dir, incremental=True)
+            full = build(source_dir, Path(scratch) / case.replace(" ", "-"), incremental=False)
+            if "index.html" not in incremental:
+                failures.append(f"{case}: index.html missing after the incremental build")
+            elif incremental != full:
+                failures.append(f"{case}: incremental output differs from a full build")
+    
+    for failure in failures:
+        print(f"❌ {failure}")
+    print("✅ Listing ownership check passed" if not failures else "❌ Listing ownership check failed")
+    return not failures
+
+def check_large_listing(entry_count=100_000, dir_count=1_000):
+    """Regression check: a synthetic directory of entry_count entries paginates into
+    ceil(entry_count / page size) listing pages that show every entry exactly once"""
+    with tempfile.TemporaryDirectory() as scratch:
+        generator = FastSiteGenerator(scratch, Path(scratch) / "site", search=False)
+        children = [SiteNode(f"dir{i:06d}", 'dir', Path(scratch) / f"dir{i:06d}") for i in range(dir_count)]
+        children += [SiteNode(f"page{i:06d}.md", 'file', Path(scratch) / f"page{i:06d}.md")
+                     for i in range(entry_count - dir_count)]
+        node = SiteNode("big", 'dir', Path(scratch) / "big", children=children)
+        relative_path = Path("big")
+        
+        start = time.perf_counter()
+        entries = generator.collect_listing_entries(node, relative_path)
+        page_names, shown, largest = [], 0, 0
+        for page_name, html in generator.iter_listing_pages(node, relative_path, entries):
+            page_names.append(page_name)
+            shown += html.count('<div class="file-item">')
+            largest = max(largest, len(html))
+        elapsed = time.perf_counter() - start
+    
+    expected_pages = -(-entry_count // generator.listing_page_size)
+    expected_names = [generator.listing_page_name(page) for page in range(1, expected_pages + 1)]
+    print(f"📁 {entry_count} entries -> {len(page_names)} pages in {elapsed:.2f}s, largest page {largest // 1024} KB")
+    failures = []
+    if page_names != expected_names:
+        failures.append(f"expected {expected_pages} pages named index.html .. index-{expected_pages}.html")
+    if shown != entry_count:
+        failures.append(f"{shown} entries shown instead of {entry_count}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    print("✅ Large listing check passed" if not failures else "❌ Large listing check failed")
+    return not failures
+
 def main():
     """Main execution"""
-    generator = FastSiteGenerator()
+    parser = argparse.ArgumentParser(description="Generate a static GitHub Pages site from markdown docs")
+    parser.add_argument("source_dir", nargs="?", default=".", help="Directory containing the docs")
+    parser.add_argument("--output", default="docs", help="Output directory for the generated site")
+    parser.add_argument("--incremental", action="store_true", default=False,
+                        help="Only re-render pages whose sources changed since the last build")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Number of worker processes used to render pages")
+    parser.add_argument("--listing-page-size", type=int, default=DEFAULT_LISTING_PAGE_SIZE,
+                        help="Entries per directory listing page (0 disables pagination)")
+    parser.add_argument("--no-search", dest="search", action="store_false", default=True,
+                        help="Do not build the client-side search index")
+    parser.add_argument("--timestamps", choices=TIMESTAMP_MODES, default='now',
+                        help="Footer timestamps: build time, or source mtime / last git commit for reproducible output")
+    parser.add_argument("--compress", action="store_true", default=False,
+                        help="Write pre-compressed .gz/.br twins of HTML/CSS/JS/JSON outputs")
+    parser.add_argument("--compress-min-size", type=int, default=DEFAULT_COMPRESS_MIN_SIZE,
+                        help="Smallest file size (in bytes) worth compressing")
+    parser.add_argument("--benchmark", action="store_true", default=False,
+                        help="Measure per-page render cost instead of building the site")
+    parser.add_argument("--self-check", action="store_true", default=False,
+                        help="Run the regression checks (incremental builds, 100k-entry listing) and exit")
+    parser.add_argument("--serve", action="store_true", default=False,
+                        help="Build, then watch the sources and serve the site with live reload")
+    parser.add_argument("--port", type=int, default=8000, help="Port for --serve")
+    args = parser.parse_args()
+    
+    if args.self_check:
+        passed = check_listing_ownership()
+        passed = check_large_listing() and passed
+        raise SystemExit(0 if passed else 1)
+    
+    generator = FastSiteGenerator(args.source_dir, args.output, incremental=args.incremental, jobs=args.jobs,
+                                  listing_page_size=args.listing_page_size, search=args.search,
+                                  timestamps=args.timestamps,
+                                  compress_min_size=args.compress_min_size if args.compress else None)
+    if args.benchmark:
+        benchmark_rendering(generator)
+        return
+    if args.serve:
+        DevServer(generator, port=args.port).serve_forever()
+        return
     generator.generate_site()
     
     print("""